@@ -10,15 +10,22 @@ from hydrogram import Client
 from aiohttp import web
 
 from web import web_app
+from web.utils.client_pool import client_pool
+from web.utils.media_sessions import session_manager
 from info import API_ID, API_HASH, BOT_TOKEN, PORT, LOG_CHANNEL, ADMINS
 
 from utils import (
     temp,
+    governor,
+    scheduler,
+    PRIORITY_LOW,
     cleanup_files_memory,
-    premium_expiry_reminder
+    premium_expiry_reminder,
+    stream_links_gc
 )
 
 from database.users_chats_db import db
+from plugins.index import begin_catchup, catchup_index, reconcile_index
 
 # ==========================
 # 🔥 LOGGING CONFIG (OPTIMIZED)
@@ -92,11 +99,13 @@ async def check_and_remove_expired_premium(client):
                         
                         # Notify User (Fail-safe)
                         try:
-                            await client.send_message(
-                                uid,
-                                "⚠️ **Premium Expired**\n\n"
+                            await governor.call(
+                                client.send_message,
+                                chat_id=uid,
+                                text="⚠️ **Premium Expired**\n\n"
                                 "Your premium subscription has ended.\n"
-                                "Use /plan to renew and continue enjoying premium benefits!"
+                                "Use /plan to renew and continue enjoying premium benefits!",
+                                priority=PRIORITY_LOW
                             )
                         except:
                             pass
@@ -128,7 +137,8 @@ class Bot(Client):
         )
 
     async def start(self):
-        # 1. Start Hydrogram Client
+        # 1. Start Hydrogram Client (resume points frozen before updates arrive)
+        begin_catchup()
         await super().start()
         me = await self.get_me()
 
@@ -139,6 +149,9 @@ class Bot(Client):
         temp.U_NAME = me.username
         temp.B_NAME = me.first_name
 
+        # Helper bots for streaming (MULTI_TOKENS)
+        await client_pool.start(self)
+
         # 3. Handle Restart Notification
         if os.path.exists("restart.txt"):
             try:
@@ -151,6 +164,11 @@ class Bot(Client):
                 logger.warning(f"Restart message error: {e}")
             os.remove("restart.txt")
 
+        try:
+            await db.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Index creation error: {e}")
+
         # 4. Start Web Server (Non-blocking)
         app = web.AppRunner(web_app)
         await app.setup()
@@ -159,9 +177,14 @@ class Bot(Client):
 
         # 5. Start Background Tasks
         # Using create_task ensures they run in background without blocking start
+        asyncio.create_task(scheduler.run())
         asyncio.create_task(cleanup_files_memory())
         asyncio.create_task(premium_expiry_reminder(self))
         asyncio.create_task(check_and_remove_expired_premium(self))
+        asyncio.create_task(catchup_index(self))
+        asyncio.create_task(reconcile_index(self))
+        asyncio.create_task(stream_links_gc())
+        asyncio.create_task(session_manager.run(client_pool))
 
         # 6. Admin Notifications
         start_msg = (
@@ -188,6 +211,7 @@ class Bot(Client):
         logger.info(f"✅ @{me.username} Started Successfully!")
 
     async def stop(self, *args):
+        await client_pool.stop()
         await super().stop()
         logger.info("❌ Bot Stopped Cleanly")
 
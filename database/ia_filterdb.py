@@ -2,12 +2,16 @@ import logging
 import re
 import base64
 import time
+import hashlib
+from array import array
+from bisect import bisect_left
 from struct import pack
+from collections import OrderedDict
 from typing import List, Tuple, Dict, Any
 
 from hydrogram.file_id import FileId
-from pymongo import MongoClient, TEXT
-from pymongo.errors import DuplicateKeyError
+from pymongo import MongoClient, TEXT, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 
 from info import (
     DATA_DATABASE_URL,
@@ -33,6 +37,12 @@ try:
 except:
     pass
 
+# Source message lookup (channel deletions / edits)
+try:
+    col.create_index([("chat_id", 1), ("message_id", 1)], name="source_idx")
+except:
+    pass
+
 # =====================================================
 # ⚡ SUPER FAST CACHE (RAM BASED)
 # =====================================================
@@ -53,6 +63,75 @@ def set_cache(key, data):
         SEARCH_CACHE.pop(next(iter(SEARCH_CACHE)))  # Remove oldest
     SEARCH_CACHE[key] = (data, time.time())
 
+def invalidate_cache(file_ids):
+    """Drops only the cached result pages / file records that reference these files"""
+    file_ids = set(file_ids)
+    if not file_ids: return 0
+    for fid in file_ids:
+        FILE_CACHE.pop(fid, None)
+    stale = [
+        k for k, (data, _) in SEARCH_CACHE.items()
+        if any(f.get("_id") in file_ids for f in data[0])
+    ]
+    for k in stale:
+        SEARCH_CACHE.pop(k, None)
+    return len(stale)
+
+def clear_caches():
+    SEARCH_CACHE.clear()
+    FILE_CACHE.clear()
+
+# =====================================================
+# 📇 FILE RECORD CACHE (LRU)
+# =====================================================
+# Hot file records for delivery; filled by searches so a freshly
+# listed file is delivered without touching Mongo.
+FILE_CACHE = OrderedDict()
+MAX_FILE_CACHE = 5000
+FILE_PROJECTION = {"file_name": 1, "caption": 1, "file_size": 1, "quality": 1}
+
+def cache_files(docs):
+    for doc in docs:
+        FILE_CACHE[doc["_id"]] = doc
+        FILE_CACHE.move_to_end(doc["_id"])
+    while len(FILE_CACHE) > MAX_FILE_CACHE:
+        FILE_CACHE.popitem(last=False)
+
+async def get_file_details(file_id: str):
+    """Single file record (cached). Returns None if not indexed."""
+    doc = FILE_CACHE.get(file_id)
+    if doc:
+        FILE_CACHE.move_to_end(file_id)
+        return doc
+    try:
+        doc = col.find_one({"_id": file_id}, FILE_PROJECTION)
+    except Exception as e:
+        logger.error(f"File Lookup Error: {e}")
+        return None
+    if doc:
+        cache_files([doc])
+    return doc
+
+async def get_files_details(file_ids: List[str]) -> Dict[str, Dict]:
+    """Batched lookup: cache hits + one $in query for the misses"""
+    found, missing = {}, []
+    for fid in file_ids:
+        doc = FILE_CACHE.get(fid)
+        if doc:
+            FILE_CACHE.move_to_end(fid)
+            found[fid] = doc
+        else:
+            missing.append(fid)
+
+    if missing:
+        try:
+            docs = list(col.find({"_id": {"$in": missing}}, FILE_PROJECTION))
+            cache_files(docs)
+            found.update((d["_id"], d) for d in docs)
+        except Exception as e:
+            logger.error(f"Files Lookup Error: {e}")
+    return found
+
 # =====================================================
 # 🛠 UTILS (Optimized)
 # =====================================================
@@ -80,6 +159,14 @@ def clean_text(text: str) -> str:
     text = re.sub(r'(@\w+|https?://\S+|[_\-\.]+)', ' ', text)
     return " ".join(text.split())
 
+def derive_fields(file_name: str) -> Dict[str, Any]:
+    """
+    Single source of truth for fields computed from the raw file name.
+    Used on save and by the offline reindexer (database/reindex.py).
+    """
+    name = clean_text(file_name)
+    return {"file_name": name, "quality": detect_quality(name)}
+
 # =====================================================
 # 🔍 SEARCH ENGINE (The Core)
 # =====================================================
@@ -92,13 +179,15 @@ async def get_search_results(query: str, offset: int = 0, limit: int = MAX_BTN)
     # 1. Check Cache
     cache_key = f"{query.lower()}|{offset}"
     cached = get_cached(cache_key)
-    if cached: return cached
+    if cached:
+        cache_files(cached[0])
+        return cached
 
     # 2. Text Search (Primary & Fast)
     search_filter = {"$text": {"$search": query}}
     
     # Use projection to fetch ONLY needed fields (Saves Bandwidth)
-    projection = {"file_name": 1, "caption": 1, "file_size": 1, "quality": 1}
+    projection = FILE_PROJECTION
     
     cursor = col.find(search_filter, projection).sort([("score", {"$meta": "textScore"})])
     
@@ -119,36 +208,54 @@ async def get_search_results(query: str, offset: int = 0, limit: int = MAX_BTN)
     
     result = (files, next_offset, count)
     set_cache(cache_key, result)
+    cache_files(files)  # Delivery of listed files skips Mongo
     return result
 
 # =====================================================
 # 💾 SAVE FILE
 # =====================================================
+def pack_file_id(file_id: str):
+    """Packs a Telegram file_id into the short DB _id. Returns None if invalid."""
+    try:
+        # Custom packing (Legacy support)
+        decoded = FileId.decode(file_id)
+        packed = pack("<iiqq", int(decoded.file_type), decoded.dc_id, decoded.media_id, decoded.access_hash)
+        return base64.urlsafe_b64encode(b"" + packed).decode().rstrip("=")
+    except:
+        return None
+
+def build_file_doc(media):
+    """
+    Builds the DB document for a media object. Returns None if invalid.
+    Like `caption`, the source `chat_id` / `message_id` are read off the
+    media object when the caller attached them.
+    """
+    if not media: return None
+
+    file_id = pack_file_id(media.file_id)
+    if not file_id: return None
+
+    raw_name = getattr(media, 'file_name', "Untitled")
+    derived = derive_fields(raw_name)
+    return {
+        "_id": file_id,
+        "file_name": derived["file_name"],
+        "raw_name": raw_name,  # Kept so derive_fields changes can be re-applied offline
+        "file_size": getattr(media, 'file_size', 0),
+        "caption": getattr(media, 'caption', ""),
+        "quality": derived["quality"],
+        "chat_id": getattr(media, 'chat_id', None),
+        "message_id": getattr(media, 'message_id', None)
+    }
+
+# Fields refreshed when an already indexed file is seen again
+UPDATE_FIELDS = ("caption", "quality", "raw_name", "chat_id", "message_id")
+
 async def save_file(media):
     """Saves file to DB. Returns: 'suc', 'dup', or 'err'"""
     try:
-        if not media: return "err"
-
-        # Unique ID Generation
-        file_id = media.file_id
-        try:
-            # Custom packing (Legacy support)
-            decoded = FileId.decode(file_id)
-            packed = pack("<iiqq", int(decoded.file_type), decoded.dc_id, decoded.media_id, decoded.access_hash)
-            file_id = base64.urlsafe_b64encode(b"" + packed).decode().rstrip("=")
-        except:
-            return "err"
-
-        name = clean_text(getattr(media, 'file_name', "Untitled"))
-        caption = getattr(media, 'caption', "")
-        
-        doc = {
-            "_id": file_id,
-            "file_name": name,
-            "file_size": getattr(media, 'file_size', 0),
-            "caption": caption,
-            "quality": detect_quality(name)
-        }
+        doc = build_file_doc(media)
+        if not doc: return "err"
 
         col.insert_one(doc)
         return "suc"
@@ -157,13 +264,142 @@ async def save_file(media):
         # Fast update without re-fetching
         col.update_one(
             {"_id": doc["_id"]}, 
-            {"$set": {"caption": doc["caption"], "quality": doc["quality"]}}
+            {"$set": {k: doc[k] for k in UPDATE_FIELDS}}
         )
         return "dup"
     except Exception as e:
         logger.error(f"Save Error: {e}")
         return "err"
 
+async def save_files(medias: List) -> List[str]:
+    """
+    Bulk version of save_file: one unordered write for the whole batch.
+    Returns a status ('suc', 'dup', 'err') per media, in input order.
+    """
+    statuses = ["err"] * len(medias)
+    ops, positions = [], []
+
+    for i, media in enumerate(medias):
+        doc = build_file_doc(media)
+        if not doc: continue
+        fields = {k: v for k, v in doc.items() if k != "_id" and k not in UPDATE_FIELDS}
+        ops.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$setOnInsert": fields, "$set": {k: doc[k] for k in UPDATE_FIELDS}},
+            upsert=True
+        ))
+        positions.append(i)
+
+    if not ops: return statuses
+
+    try:
+        res = col.bulk_write(ops, ordered=False)
+        inserted = set(res.upserted_ids)
+        for op_idx, i in enumerate(positions):
+            statuses[i] = "suc" if op_idx in inserted else "dup"
+    except BulkWriteError as e:
+        failed = {err["index"] for err in e.details.get("writeErrors", [])}
+        inserted = {u["index"] for u in e.details.get("upserted", [])}
+        for op_idx, i in enumerate(positions):
+            if op_idx in failed: continue
+            statuses[i] = "suc" if op_idx in inserted else "dup"
+        logger.error(f"Bulk Save Error: {len(failed)} failed")
+    except Exception as e:
+        logger.error(f"Bulk Save Error: {e}")
+
+    return statuses
+
+# =====================================================
+# 🧬 KNOWN FILE PRE-FILTER (Re-index speedup)
+# =====================================================
+def file_hash(file_id: str) -> int:
+    """8-byte hash of a packed file id"""
+    return int.from_bytes(hashlib.blake2b(file_id.encode(), digest_size=8).digest(), "little")
+
+def load_known_hashes(chat_id: int) -> array:
+    """
+    Sorted array of hashes for files already indexed from this channel
+    (8 bytes per file). Sync on purpose: run it with asyncio.to_thread.
+    Docs without source ids (saved before chat_id was stored) are included:
+    their channel is unknown, and saving them again would only be a dup.
+    """
+    cursor = col.find({"chat_id": {"$in": [chat_id, None]}}, {"_id": 1}).batch_size(5000)
+    return array("Q", sorted(file_hash(d["_id"]) for d in cursor))
+
+def is_known(known: array, file_id: str) -> bool:
+    h = file_hash(file_id)
+    i = bisect_left(known, h)
+    return i < len(known) and known[i] == h
+
+def get_source_range(chat_id: int, start: int, end: int) -> Dict[int, Dict]:
+    """Stored files for source posts start <= message_id < end (uses source_idx)"""
+    cursor = col.find(
+        {"chat_id": chat_id, "message_id": {"$gte": start, "$lt": end}},
+        {"_id": 1, "message_id": 1, "caption": 1}
+    )
+    return {d["message_id"]: d for d in cursor}
+
+def get_max_source_id(chat_id: int) -> int:
+    doc = col.find_one({"chat_id": chat_id}, {"message_id": 1}, sort=[("message_id", -1)])
+    return doc["message_id"] if doc else 0
+
+def get_existing_ids(file_ids: List[str]) -> set:
+    return {d["_id"] for d in col.find({"_id": {"$in": list(file_ids)}}, {"_id": 1})}
+
+async def set_sources(items: List[Tuple[str, int, int]]) -> int:
+    """Backfills (chat_id, message_id) on legacy docs from (packed_id, chat_id, message_id)"""
+    if not items: return 0
+    try:
+        ops = [
+            UpdateOne({"_id": fid, "chat_id": None}, {"$set": {"chat_id": cid, "message_id": mid}})
+            for fid, cid, mid in items
+        ]
+        res = col.bulk_write(ops, ordered=False)
+        invalidate_cache(fid for fid, _, _ in items)
+        return res.modified_count
+    except Exception as e:
+        logger.error(f"Source Bulk Error: {e}")
+        return 0
+
+async def update_captions(items: List[Tuple[str, str]]) -> int:
+    """Bulk caption-only refresh for (packed_id, caption) pairs"""
+    if not items: return 0
+    try:
+        ops = [UpdateOne({"_id": fid}, {"$set": {"caption": cap}}) for fid, cap in items]
+        res = col.bulk_write(ops, ordered=False)
+        invalidate_cache(fid for fid, _ in items)
+        return res.modified_count
+    except Exception as e:
+        logger.error(f"Caption Bulk Error: {e}")
+        return 0
+
+# =====================================================
+# ✏️ CAPTION UPDATE
+# =====================================================
+async def update_file_caption(file_id: str, caption: str, chat_id: int = None, message_id: int = None) -> bool:
+    """
+    Targeted caption update. Looks up by packed file id (primary key),
+    falling back to the source (chat_id, message_id) pair when the id is
+    unknown (e.g. the edit also replaced the media).
+    """
+    try:
+        packed = pack_file_id(file_id) if file_id else None
+        queries = [{"_id": packed}] if packed else []
+        if chat_id is not None and message_id is not None:
+            queries.append({"chat_id": chat_id, "message_id": message_id})
+
+        doc = None
+        for query in queries:
+            doc = col.find_one_and_update(query, {"$set": {"caption": caption}}, projection={"_id": 1})
+            if doc: break
+        if not doc: return False
+
+        invalidate_cache([doc["_id"]])
+        return True
+    except Exception as e:
+        logger.error(f"Caption Update Error: {e}")
+        return False
+
 # =====================================================
 # 🗑 DELETE UTILS
 # =====================================================
@@ -171,15 +407,39 @@ async def delete_files(query: str):
     try:
         reg = re.compile(re.escape(query), re.IGNORECASE)
         res = col.delete_many({"file_name": reg})
-        SEARCH_CACHE.clear()
+        clear_caches()
         return res.deleted_count
     except:
         return 0
 
+async def delete_by_source(chat_id: int, message_ids: List[int]):
+    """Removes files whose source channel posts were deleted"""
+    try:
+        source = {"chat_id": chat_id, "message_id": {"$in": list(message_ids)}}
+        ids = [d["_id"] for d in col.find(source, {"_id": 1})]
+        if not ids: return 0
+        res = col.delete_many(source)
+        invalidate_cache(ids)
+        return res.deleted_count
+    except Exception as e:
+        logger.error(f"Delete By Source Error: {e}")
+        return 0
+
+async def delete_file_ids(file_ids: List[str]):
+    try:
+        file_ids = list(file_ids)
+        if not file_ids: return 0
+        res = col.delete_many({"_id": {"$in": file_ids}})
+        invalidate_cache(file_ids)
+        return res.deleted_count
+    except Exception as e:
+        logger.error(f"Delete Ids Error: {e}")
+        return 0
+
 async def delete_all_files():
     try:
         res = col.delete_many({})
-        SEARCH_CACHE.clear()
+        clear_caches()
         return res.deleted_count
     except:
         return 0
@@ -0,0 +1,138 @@
+"""
+Offline reindex / migration runner.
+
+Recomputes derived fields (see `derive_fields` in ia_filterdb) for every
+document in the files collection without starting the bot:
+
+    python3 -m database.reindex [--batch 2000] [--workers 4] [--reset]
+
+Progress is checkpointed after every batch, so an interrupted run picks
+up where it stopped. A finished run is marked done; the next run starts
+over from the first document.
+"""
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database.ia_filterdb import db, col, derive_fields
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="[%(asctime)s] %(levelname)s: %(message)s",
+    datefmt="%d-%b %H:%M"
+)
+logger = logging.getLogger("REINDEX")
+
+MIGRATION_NAME = "derived_fields"
+migrations = db["migrations"]
+
+# =====================================================
+# 🔁 RESUME TOKENS
+# =====================================================
+def get_resume(name):
+    """last _id of an unfinished run, else None"""
+    d = migrations.find_one({"_id": name})
+    return d.get("last_id") if d and not d.get("done") else None
+
+def set_resume(name, last_id, stats):
+    migrations.update_one(
+        {"_id": name},
+        {"$set": {"last_id": last_id, "stats": stats, "done": False, "updated_at": time.time()}},
+        upsert=True
+    )
+
+def finish_resume(name, stats):
+    migrations.update_one(
+        {"_id": name},
+        {"$set": {"stats": stats, "done": True, "updated_at": time.time()}, "$unset": {"last_id": ""}},
+        upsert=True
+    )
+
+# =====================================================
+# 🧮 WORKER (Runs in process pool, no DB access)
+# =====================================================
+def recompute_chunk(docs):
+    """Returns [(_id, changed_fields)] for docs whose derived fields differ"""
+    changed = []
+    for doc in docs:
+        # Legacy docs predate raw_name: best effort from the cleaned name
+        fields = derive_fields(doc.get("raw_name") or doc.get("file_name") or "")
+        diff = {k: v for k, v in fields.items() if doc.get(k) != v}
+        if diff:
+            changed.append((doc["_id"], diff))
+    return changed
+
+# =====================================================
+# 🚀 RUNNER
+# =====================================================
+def read_batches(start_after, batch_size):
+    query = {"_id": {"$gt": start_after}} if start_after is not None else {}
+    cursor = (
+        col.find(query, {"file_name": 1, "raw_name": 1, "quality": 1})
+        .sort("_id", 1)
+        .batch_size(batch_size)
+    )
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def write_updates(changed):
+    if not changed:
+        return 0
+    ops = [UpdateOne({"_id": _id}, {"$set": fields}) for _id, fields in changed]
+    try:
+        return col.bulk_write(ops, ordered=False).modified_count
+    except BulkWriteError as e:
+        logger.error(f"Bulk write errors: {len(e.details.get('writeErrors', []))}")
+        return e.details.get("nModified", 0)
+
+def run(name=MIGRATION_NAME, batch_size=2000, workers=None, reset=False):
+    workers = workers or os.cpu_count() or 1
+    start_after = None if reset else get_resume(name)
+    if start_after is not None:
+        logger.info(f"Resuming '{name}' after _id {start_after}")
+
+    total = col.estimated_document_count()
+    scanned = updated = 0
+    started = time.time()
+    chunk = max(1, batch_size // workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in read_batches(start_after, batch_size):
+            parts = [batch[i:i + chunk] for i in range(0, len(batch), chunk)]
+            changed = [c for part in pool.map(recompute_chunk, parts) for c in part]
+
+            updated += write_updates(changed)
+            scanned += len(batch)
+
+            set_resume(name, batch[-1]["_id"], {"scanned": scanned, "updated": updated})
+
+            elapsed = time.time() - started
+            rate = scanned / elapsed if elapsed else 0
+            logger.info(
+                f"📊 {scanned}/{total} scanned | ✏️ {updated} updated | ⚡ {rate:.0f} docs/s"
+            )
+
+    finish_resume(name, {"scanned": scanned, "updated": updated})
+    logger.info(f"✅ '{name}' done: {scanned} scanned, {updated} updated in {time.time() - started:.1f}s")
+    return scanned, updated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute derived fields for indexed files")
+    parser.add_argument("--name", default=MIGRATION_NAME, help="Migration name (resume token key)")
+    parser.add_argument("--batch", type=int, default=2000, help="Documents per cursor batch / bulk write")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--reset", action="store_true", help="Ignore the saved resume token")
+    args = parser.parse_args()
+
+    run(args.name, args.batch, args.workers, args.reset)
@@ -61,17 +61,32 @@ class Database:
             self.reminders = self.db.reminders
             self.bans = self.db.bans
             self.warns = self.db.warns
+            self.jobs = self.db.scheduled_jobs
+            self.stream_links = self.db.stream_links
             
             # Local RAM Cache (Ultra Speed)
             self._premium_cache = {} 
             self._ban_cache = {}
 
+            # Called with user_id after plan / ban writes (cache invalidation)
+            self._listeners = []
+
             logger.info("✅ Database (Motor) Connected Successfully")
             
         except Exception as e:
             logger.error(f"❌ Database Connection Failed: {e}")
             raise e
 
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    def _notify(self, user_id: int):
+        for fn in self._listeners:
+            try:
+                fn(user_id)
+            except Exception as e:
+                logger.error(f"Listener error: {e}")
+
     # =========================
     # 👥 USERS
     # =========================
@@ -104,6 +119,8 @@ class Database:
     async def delete_user(self, user_id: int):
         await self.users.delete_one({"id": user_id})
         await self.premium.delete_one({"id": user_id})
+        self._premium_cache.pop(user_id, None)
+        self._notify(user_id)
 
     # =========================
     # 🚫 BANS (With Caching)
@@ -119,12 +136,14 @@ class Database:
             upsert=True
         )
         self._ban_cache[user_id] = {"status": True, "until": until} # Update Cache
+        self._notify(user_id)
         return True
 
     async def unban_user(self, user_id: int):
         await self.bans.delete_one({"id": user_id})
         if user_id in self._ban_cache:
             del self._ban_cache[user_id] # Clear Cache
+        self._notify(user_id)
         return True
 
     async def get_ban_status(self, user_id: int):
@@ -214,6 +233,7 @@ class Database:
         )
         # Update Cache
         self._premium_cache[user_id] = plan_data
+        self._notify(user_id)
         return True
 
     async def remove_premium(self, user_id: int):
@@ -222,11 +242,58 @@ class Database:
         # Remove from Cache
         if user_id in self._premium_cache:
             del self._premium_cache[user_id]
+        self._notify(user_id)
 
     async def get_premium_users(self):
         """Returns cursor of all premium users"""
         return self.premium.find({"plan.premium": True})
 
+    # =========================
+    # ⏰ SCHEDULED JOBS
+    # =========================
+    async def add_job(self, job: dict):
+        await self.jobs.insert_one(job)
+
+    async def delete_jobs(self, job_ids: list):
+        if job_ids:
+            await self.jobs.delete_many({"_id": {"$in": job_ids}})
+
+    async def get_jobs(self):
+        """Returns cursor of all pending jobs"""
+        return self.jobs.find({})
+
+    # =========================
+    # 🔗 STREAM LINKS (file_id -> BIN_CHANNEL msg)
+    # =========================
+    async def ensure_indexes(self):
+        await self.stream_links.create_index("last_used")
+        await self.stream_links.create_index("msg_id")
+
+    async def get_stream_link(self, file_id: str):
+        return await self.stream_links.find_one({"_id": file_id})
+
+    async def save_stream_link(self, file_id: str, msg_id: int):
+        await self.stream_links.update_one(
+            {"_id": file_id},
+            {"$set": {"msg_id": msg_id, "last_used": time.time()}},
+            upsert=True
+        )
+
+    async def touch_stream_link(self, file_id: str):
+        await self.stream_links.update_one({"_id": file_id}, {"$set": {"last_used": time.time()}})
+
+    async def touch_stream_msg(self, msg_id: int):
+        """Same as touch_stream_link, by BIN message (/watch, /download)"""
+        await self.stream_links.update_one({"msg_id": msg_id}, {"$set": {"last_used": time.time()}})
+
+    async def get_stream_links(self):
+        """Returns cursor of all stream links"""
+        return self.stream_links.find({})
+
+    async def delete_stream_links(self, file_ids: list):
+        if file_ids:
+            await self.stream_links.delete_many({"_id": {"$in": file_ids}})
+
 # =========================
 # EXPORT
 # =========================
@@ -138,6 +138,17 @@ WELCOME_TEXT = environ.get("WELCOME_TEXT", script.WELCOME_TEXT)
 
 PM_FILE_DELETE_TIME = int(environ.get('PM_FILE_DELETE_TIME', 3600))
 
+# ================= RATE LIMITS =================
+
+TG_RATE_LIMIT = float(environ.get('TG_RATE_LIMIT', 25))    # Global API calls / sec
+TG_CHAT_RATE = float(environ.get('TG_CHAT_RATE', 1))       # Messages / sec per chat
+TG_FLOOD_RETRIES = int(environ.get('TG_FLOOD_RETRIES', 3))
+DELIVERY_RATE = float(environ.get('DELIVERY_RATE', 10))              # File sends / sec (all users)
+DELIVERY_WORKERS = int(environ.get('DELIVERY_WORKERS', 8))
+DELIVERY_QUEUE_MAX = int(environ.get('DELIVERY_QUEUE_MAX', 30))      # Pending files per user
+DELIVERY_PREMIUM_WEIGHT = float(environ.get('DELIVERY_PREMIUM_WEIGHT', 3))
+DELIVERY_ADMIN_WEIGHT = float(environ.get('DELIVERY_ADMIN_WEIGHT', 5))
+
 # ================= BOOLEAN FLAGS =================
 
 USE_CAPTION_FILTER = is_enabled('USE_CAPTION_FILTER', True)
@@ -146,6 +157,13 @@ AUTO_DELETE = is_enabled('AUTO_DELETE', False)
 WELCOME = is_enabled('WELCOME', True)
 PROTECT_CONTENT = is_enabled('PROTECT_CONTENT', False)
 LINK_MODE = is_enabled("LINK_MODE", True)
+LIVE_INDEX_REACT = is_enabled('LIVE_INDEX_REACT', False)
+
+# ================= LIVE INDEX =================
+
+LIVE_INDEX_BATCH = int(environ.get('LIVE_INDEX_BATCH', 50))        # Flush after N files
+LIVE_INDEX_FLUSH = float(environ.get('LIVE_INDEX_FLUSH', 1))       # ...or after N seconds
+RECONCILE_INTERVAL = int(environ.get('RECONCILE_INTERVAL', 86400)) # Channel <-> index sync, 0 = off
 
 # ================= STREAM =================
 
@@ -171,6 +189,23 @@ else:
     logger.error('URL is invalid')
     exit()
 
+# Extra bot tokens (space separated) that share streaming load; must be in BIN_CHANNEL
+MULTI_TOKENS = environ.get('MULTI_TOKENS', '').split()
+# Admission control / shaping for /download (rates in KB/s, 0 = unlimited)
+STREAM_MAX_PER_IP = int(environ.get('STREAM_MAX_PER_IP', 4))
+STREAM_MAX_TOTAL = int(environ.get('STREAM_MAX_TOTAL', 200))
+STREAM_RATE = int(environ.get('STREAM_RATE', 1024)) * 1024                  # Shared / anonymous links
+STREAM_PREMIUM_RATE = int(environ.get('STREAM_PREMIUM_RATE', 4096)) * 1024  # Links generated by premium users
+TRUST_PROXY = is_enabled('TRUST_PROXY', False)  # Behind one reverse proxy: use its X-Forwarded-For hop
+STREAM_WARM_DCS = [int(dc) for dc in environ.get('STREAM_WARM_DCS', '1 2 3 4 5').split()]  # Media sessions opened at startup
+SESSION_CHECK_INTERVAL = int(environ.get('SESSION_CHECK_INTERVAL', 300))  # Media session health check, 0 = off
+STREAM_PREFETCH = int(environ.get('STREAM_PREFETCH', 4))    # GetFile requests in flight per stream
+STREAM_CACHE_DIR = environ.get('STREAM_CACHE_DIR', 'stream_cache')
+STREAM_CACHE_SIZE = int(environ.get('STREAM_CACHE_SIZE', 1024)) * 1024 * 1024  # MB on disk, 0 = off
+STREAM_SHARED_CHUNKS = int(environ.get('STREAM_SHARED_CHUNKS', 32))  # Recent parts kept in RAM for concurrent viewers
+STREAM_META_CACHE = int(environ.get('STREAM_META_CACHE', 5000))       # BIN_CHANNEL messages with decoded metadata
+STREAM_LINK_TTL = int(environ.get('STREAM_LINK_TTL', 30)) * 86400   # Days unused before a BIN copy is deleted, 0 = keep
+
 # ================= PREMIUM =================
 
 IS_PREMIUM = is_enabled('IS_PREMIUM', True)
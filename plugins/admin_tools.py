@@ -12,7 +12,8 @@ from hydrogram.errors import MessageNotModified, MessageIdInvalid, BadRequest
 from info import ADMINS, LOG_CHANNEL
 from database.users_chats_db import db
 from database.ia_filterdb import db_count_documents, delete_files, delete_all_files, delete_by_quality
-from utils import get_size, get_readable_time, temp
+from utils import get_size, get_readable_time, temp, get_index_metrics, delivery_queue
+from web.utils.client_pool import client_pool
 
 # ======================================================
 # 🧠 CONFIG & INIT
@@ -73,9 +74,34 @@ async def build_dashboard():
     # Index Stats
     idx_txt = "💤 Idle"
     if temp.INDEX_STATS.get("running"):
-        elapsed = time.time() - temp.INDEX_STATS['start']
-        speed = temp.INDEX_STATS['saved'] / elapsed if elapsed > 0 else 0
-        idx_txt = f"🚀 {speed:.1f} f/s"
+        m = get_index_metrics()
+        idx_txt = (
+            f"🚀 `{m['scanned']}` scanned\n"
+            f"   📨 {m['msgs_per_sec']:.1f} msg/s | 💾 {m['files_per_sec']:.1f} f/s\n"
+            f"   ♻️ {m['dup_ratio'] * 100:.0f}% dup | ⏳ {m['flood_seconds']}s flood | 🗄 {m['db_latency_ms']:.0f} ms"
+        )
+
+    # Channel <-> index drift (last reconciliation)
+    rec = temp.RECONCILE_STATS
+    if rec.get("running"):
+        drift_txt = "🔄 Running"
+    elif rec.get("last_run"):
+        drift_txt = (
+            f"➕`{rec['missing']}` 🗑`{rec['stale']}` ✏️`{rec['caption']}` 🔗`{rec['sourced']}` "
+            f"/ `{rec['checked']}` ({get_readable_time(time.time() - rec['last_run'])} ago)"
+        )
+    else:
+        drift_txt = "⏳ Not run yet"
+
+    # Delivery queue
+    dq = delivery_queue.stats()
+    dq_txt = f"`{dq['depth']}` queued / `{dq['users']}` users | ⏳ {dq['avg_wait_ms']:.0f} ms wait"
+
+    # Stream clients (main + helpers)
+    stream_txt = " | ".join(
+        f"#{c['client']} `{c['load']}`▶️ {c['served_mb']:.0f}MB" + (f" ⏳{c['blocked']}s" if c['blocked'] else "")
+        for c in client_pool.stats()
+    ) or "—"
 
     return (
         "📊 <b>ADMIN CONTROL PANEL</b>\n\n"
@@ -84,6 +110,9 @@ async def build_dashboard():
         f"📦 <b>Files:</b> `{files}`\n"
         f"💎 <b>Premium:</b> `{premium}`\n\n"
         f"⚡ <b>Index:</b> {idx_txt}\n"
+        f"🔍 <b>Drift:</b> {drift_txt}\n"
+        f"📬 <b>Delivery:</b> {dq_txt}\n"
+        f"🤹 <b>Streams:</b> {stream_txt}\n"
         f"🗃 <b>DB Size:</b> `{db_size}`\n"
         f"⏱ <b>Uptime:</b> `{uptime}`"
     )
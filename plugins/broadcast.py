@@ -87,8 +87,10 @@ async def user_broadcast(bot, message):
                     success += 1
                 else:
                     failed += 1
-                    removed += 1
-                    await db.delete_user(int(u["id"]))
+                    # FloodWait failures are rate issues, not dead users
+                    if res == "Error":
+                        removed += 1
+                        await db.delete_user(int(u["id"]))
 
             if done % 100 == 0:
                 btn = [[InlineKeyboardButton("❌ CANCEL", callback_data="broadcast_cancel#users")]]
@@ -103,8 +105,6 @@ async def user_broadcast(bot, message):
                     reply_markup=InlineKeyboardMarkup(btn),
                 )
 
-            await asyncio.sleep(0.4)
-
     await status.edit(
         f"✅ <b>Broadcast Completed</b>\n\n"
         f"👥 Target users: <code>{total}</code>\n"
@@ -174,8 +174,6 @@ async def group_broadcast(bot, message):
                     reply_markup=InlineKeyboardMarkup(btn),
                 )
 
-            await asyncio.sleep(1)
-
     await status.edit(
         f"✅ <b>Group Broadcast Completed</b>\n\n"
         f"💬 Total groups: <code>{total}</code>\n"
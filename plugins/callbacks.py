@@ -22,13 +22,14 @@ from info import (
     ADMINS,
     PICS,
     URL,
-    BIN_CHANNEL,
     script
 )
 
-from utils import is_premium, temp
+from utils import is_premium, temp, stream_links
 from database.users_chats_db import db
 from database.ia_filterdb import db_count_documents
+from web.utils.custom_dl import cache_stream_meta
+from web.utils.stream_limits import sign_stream_user
 
 # ======================================================
 # 🛡 SAFE EDIT HELPERS
@@ -101,14 +102,17 @@ async def cb_handler(client: Client, query: CallbackQuery):
 
             # 2. Generate Links
             try:
-                # Forward to BIN to get public link
-                log_msg = await client.send_cached_media(
-                    chat_id=BIN_CHANNEL,
-                    file_id=file_id
-                )
+                # Forward to BIN once per file, reuse afterwards
+                msg_id, log_msg = await stream_links.get(client, file_id)
                 
-                stream_link = f"{URL}watch/{log_msg.id}"
-                dl_link = f"{URL}download/{log_msg.id}"
+                # Warm the stream metadata cache: first range request skips get_messages
+                if log_msg:
+                    cache_stream_meta(log_msg)
+
+                # ?t= maps the link back to this user's bandwidth tier
+                token = sign_stream_user(uid)
+                stream_link = f"{URL}watch/{msg_id}?t={token}"
+                dl_link = f"{URL}download/{msg_id}?t={token}"
                 
                 btn = InlineKeyboardMarkup([
                     [InlineKeyboardButton("▶️ Watch", url=stream_link),
@@ -1,19 +1,27 @@
 import asyncio
 from hydrogram import Client, filters
 from hydrogram.errors import (
-    FloodWait,
     MessageNotModified,
     ReactionInvalid,
     ChatWriteForbidden
 )
 
-from info import INDEX_CHANNELS, LOG_CHANNEL
+from info import (
+    INDEX_CHANNELS,
+    LOG_CHANNEL,
+    LIVE_INDEX_BATCH,
+    LIVE_INDEX_FLUSH,
+    LIVE_INDEX_REACT
+)
+from utils import governor, PRIORITY_LOW
 from database.ia_filterdb import (
-    save_file,
-    update_file_caption,
-    detect_quality
+    save_files,
+    delete_by_source,
+    update_file_caption
 )
 
+from plugins.index import advance_resume, CATCHING_UP
+
 # 🔥 Import manual index cancel flag
 try:
     from plugins.index import CANCEL_INDEX
@@ -31,17 +39,10 @@ media_filter = (filters.video | filters.document)
 
 async def safe_react(message, emoji: str):
     try:
-        await message.react(emoji)
+        await governor.call(message.react, emoji, scope=message.chat.id, priority=PRIORITY_LOW)
         return True
     except ReactionInvalid:
         return False
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        try:
-            await message.react(emoji)
-            return True
-        except:
-            return False
     except Exception:
         return False
 
@@ -50,15 +51,8 @@ async def safe_log(client, text: str):
     if not LOG_CHANNEL:
         return False
     try:
-        await client.send_message(LOG_CHANNEL, text)
+        await governor.call(client.send_message, chat_id=LOG_CHANNEL, text=text, priority=PRIORITY_LOW)
         return True
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        try:
-            await client.send_message(LOG_CHANNEL, text)
-            return True
-        except:
-            return False
     except (ChatWriteForbidden, Exception):
         return False
 
@@ -84,11 +78,25 @@ def format_file_size(size_bytes: int) -> str:
         return "Unknown"
 
 # ─────────────────────────────────────────────
-# 📥 AUTO INDEX (LIVE POSTS ONLY)
+# 📥 AUTO INDEX (LIVE POSTS ONLY, MICRO-BATCHED)
 # ─────────────────────────────────────────────
 
+STATUS_EMOJI = {
+    "suc": "✅",
+    "dup": "♻️",
+    "err": "❌",
+}
+
+# Buffered live posts: (message, media)
+PENDING = []
+FLUSH_LOCK = asyncio.Lock()
+_flush_task = None
+
+
 @Client.on_message(filters.chat(INDEX_CHANNELS) & media_filter, group=10)
 async def index_new_file(bot, message):
+    global _flush_task
+
     # 🛑 Skip if manual indexing running for this channel
     if CANCEL_INDEX.get(message.chat.id) is False:
         return
@@ -97,76 +105,133 @@ async def index_new_file(bot, message):
     if not media:
         return
 
-    try:
-        caption = message.caption or ""
-        quality = detect_quality(media.file_name, caption)
-        file_size = getattr(media, "file_size", 0)
+    media.caption = message.caption or ""
+    media.chat_id = message.chat.id
+    media.message_id = message.id
+    PENDING.append((message, media))
 
-        status = await save_file(media, quality=quality)
+    if len(PENDING) >= LIVE_INDEX_BATCH:
+        await flush_pending(bot)
+    elif not _flush_task or _flush_task.done():
+        _flush_task = asyncio.create_task(delayed_flush(bot))
 
-        emoji_map = {
-            "suc": "✅",
-            "dup": "♻️",
-            "err": "❌",
-            "skip": "⏭",
-        }
 
-        await safe_react(message, emoji_map.get(status, "❓"))
+async def delayed_flush(bot):
+    await asyncio.sleep(LIVE_INDEX_FLUSH)
+    await flush_pending(bot)
 
-        await safe_log(
-            bot,
-            f"📥 **Auto Index**\n\n"
-            f"📄 `{media.file_name}`\n"
-            f"📊 `{format_file_size(file_size)}`\n"
-            f"🎞 `{quality}`\n"
-            f"✅ `{status}`\n"
-            f"💬 `{message.chat.title}`"
-        )
 
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-    except Exception:
-        await safe_react(message, "❌")
+async def flush_pending(bot):
+    """One bulk DB write + one log message for everything buffered"""
+    async with FLUSH_LOCK:
+        if not PENDING:
+            return
+        batch = PENDING[:]
+        PENDING.clear()
+
+        try:
+            statuses = await save_files([media for _, media in batch])
+        except Exception:
+            statuses = ["err"] * len(batch)
+
+        if LIVE_INDEX_REACT:
+            for (message, _), status in zip(batch, statuses):
+                asyncio.create_task(safe_react(message, STATUS_EMOJI.get(status, "❓")))
+
+        # Keep resume points current so restarts only catch up the real gap
+        heads = {}
+        for message, _ in batch:
+            heads[message.chat.id] = max(heads.get(message.chat.id, 0), message.id)
+        for chat_id, head in heads.items():
+            if chat_id not in CATCHING_UP:
+                await asyncio.to_thread(advance_resume, chat_id, head)
+
+        await safe_log(bot, build_batch_log(batch, statuses))
+
+
+def build_batch_log(batch, statuses, max_lines=20):
+    counts = {k: statuses.count(k) for k in STATUS_EMOJI}
+    chats = {message.chat.title for message, _ in batch}
+
+    text = (
+        f"📥 **Auto Index** (`{len(batch)}` files)\n\n"
+        f"✅ `{counts['suc']}` | ♻️ `{counts['dup']}` | ❌ `{counts['err']}`\n"
+        f"💬 `{', '.join(str(c) for c in chats)}`\n\n"
+    )
+    for (_, media), status in list(zip(batch, statuses))[:max_lines]:
+        size = format_file_size(getattr(media, "file_size", 0))
+        text += f"{STATUS_EMOJI.get(status, '❓')} `{media.file_name}` ({size})\n"
+
+    if len(batch) > max_lines:
+        text += f"\n➕ `{len(batch) - max_lines}` more"
+    return text
 
 # ─────────────────────────────────────────────
-# ✏️ CAPTION EDIT
+# ✏️ CAPTION EDIT (COALESCED)
 # ─────────────────────────────────────────────
 
+EDIT_COALESCE_WINDOW = 3  # seconds
+
+# (chat_id, message_id) -> latest edited message
+PENDING_EDITS = {}
+
+
 @Client.on_edited_message(filters.chat(INDEX_CHANNELS) & media_filter, group=11)
 async def update_caption(bot, message):
     media = get_media_info(message)
     if not media:
         return
 
-    try:
-        new_caption = message.caption or ""
-        quality = detect_quality(media.file_name, new_caption)
+    key = (message.chat.id, message.id)
+    is_new = key not in PENDING_EDITS
+    # Repeated edits inside the window only replace the pending one
+    PENDING_EDITS[key] = message
+    if is_new:
+        asyncio.create_task(apply_caption_edit(key))
+
 
+async def apply_caption_edit(key):
+    await asyncio.sleep(EDIT_COALESCE_WINDOW)
+    message = PENDING_EDITS.pop(key, None)
+    if not message:
+        return
+
+    try:
+        media = get_media_info(message)
         updated = await update_file_caption(
             media.file_id,
-            new_caption,
-            quality
+            message.caption or "",
+            chat_id=message.chat.id,
+            message_id=message.id
         )
-
-        await safe_react(message, "✏️" if updated else "⚠️")
+        if LIVE_INDEX_REACT:
+            await safe_react(message, "✏️" if updated else "⚠️")
 
     except MessageNotModified:
         pass
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
     except Exception:
-        await safe_react(message, "❌")
+        if LIVE_INDEX_REACT:
+            await safe_react(message, "❌")
 
 # ─────────────────────────────────────────────
-# 🗑️ DELETE LOG
+# 🗑️ DELETE SYNC
 # ─────────────────────────────────────────────
 
 @Client.on_deleted_messages(filters.chat(INDEX_CHANNELS), group=12)
 async def handle_deleted_files(bot, messages):
     try:
+        by_chat = {}
+        for m in messages:
+            if m.chat:
+                by_chat.setdefault(m.chat.id, []).append(m.id)
+
+        removed = 0
+        for chat_id, ids in by_chat.items():
+            removed += await delete_by_source(chat_id, ids)
+
         await safe_log(
             bot,
-            f"🗑️ **Deleted Messages**\nCount: `{len(messages)}`"
+            f"🗑️ **Deleted Messages**\nCount: `{len(messages)}` | Removed: `{removed}`"
         )
     except:
         pass
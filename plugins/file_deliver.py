@@ -1,61 +1,54 @@
 import asyncio
 import time
 import logging
-from datetime import datetime, timedelta
 
 from hydrogram import Client, filters
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
-from info import IS_STREAM, PM_FILE_DELETE_TIME, PROTECT_CONTENT, ADMINS
-from database.ia_filterdb import get_file_details
-from database.users_chats_db import db
-from utils import get_settings, get_size, temp, is_premium
+from info import (
+    IS_STREAM, PM_FILE_DELETE_TIME, PROTECT_CONTENT, ADMINS,
+    DELIVERY_PREMIUM_WEIGHT, DELIVERY_ADMIN_WEIGHT
+)
+from database.ia_filterdb import get_file_details, get_files_details
+from utils import (
+    get_settings,
+    get_size,
+    get_readable_time,
+    temp,
+    is_premium,
+    entitlements,
+    governor,
+    delivery_queue,
+    scheduler,
+    bulk_delete,
+    schedule_delete,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW
+)
 
 # ======================================================
 # 📝 LOGGING SETUP
 # ======================================================
 logger = logging.getLogger(__name__)
 
+# Fair-queue share per tier (grace / free users get 1)
+DELIVERY_WEIGHTS = {"admin": DELIVERY_ADMIN_WEIGHT, "premium": DELIVERY_PREMIUM_WEIGHT}
+
+async def delivery_weight(uid):
+    return DELIVERY_WEIGHTS.get(await entitlements.tier(uid), 1.0)
+
 # ======================================================
 # CONFIG
 # ======================================================
-GRACE_PERIOD = timedelta(minutes=30)
 RESEND_EXPIRE_TIME = 60  # seconds
+BANNED_TEXT = "🚫 You are banned from using this bot."
+BATCH_PROGRESS_EVERY = 5
 
-# Track active deletion tasks to prevent memory leaks
+# Track active delivery tasks (one per user)
 # Key: task_id, Value: asyncio.Task
 active_tasks = {}
 
-# ======================================================
-# HELPER: PREMIUM CHECK
-# ======================================================
-async def has_premium_or_grace(user_id: int) -> bool:
-    """Check if user is admin or has premium (with grace)"""
-    # 1. Check Admins
-    if user_id in ADMINS:
-        return True
-    
-    # 2. Check Plan via DB
-    try:
-        plan = await db.get_plan(user_id)
-        if not plan or not plan.get("premium"):
-            return False
-
-        expire = plan.get("expire")
-        
-        # Handle different date formats
-        if isinstance(expire, (int, float)):
-            expire = datetime.utcfromtimestamp(expire)
-        elif not isinstance(expire, datetime):
-            return False
-
-        # Check expiry with grace period
-        return datetime.utcnow() <= expire + GRACE_PERIOD
-        
-    except Exception as e:
-        logger.error(f"Premium check error for {user_id}: {e}")
-        return False
-
 # ======================================================
 # 📂 FILE BUTTON HANDLER (GROUP)
 # ======================================================
@@ -66,13 +59,16 @@ async def file_button_handler(client: Client, query: CallbackQuery):
         uid = query.from_user.id
         group_id = query.message.chat.id
         
+        if await entitlements.is_banned(uid):
+            return await query.answer(BANNED_TEXT, show_alert=True)
+        
         # 1. Check File
         file = await get_file_details(file_id)
         if not file:
             return await query.answer("❌ File Not Found", show_alert=True)
             
         # 2. Check Premium
-        is_prem = await has_premium_or_grace(uid)
+        is_prem = await is_premium(uid)
         
         # 3. IF PREMIUM -> Direct Link
         if is_prem:
@@ -111,8 +107,11 @@ async def start_file_delivery(client: Client, message):
 
     uid = message.from_user.id
     
+    if await entitlements.is_banned(uid):
+        return await message.reply_text(BANNED_TEXT)
+    
     # 1. Check Premium Access
-    is_prem = await has_premium_or_grace(uid)
+    is_prem = await is_premium(uid)
     
     if not is_prem:
         # Upsell Message
@@ -128,19 +127,13 @@ async def start_file_delivery(client: Client, message):
         except: pass
         return
 
-    # 2. Manage Tasks
-    task_key = f"dl_{uid}"
-    if task_key in active_tasks:
-        active_tasks[task_key].cancel()
-        
-    # 3. Start Delivery
-    task = asyncio.create_task(deliver_file(client, uid, grp_id, file_id))
-    active_tasks[task_key] = task
-    
-    # Cleanup task when done
-    def cleanup(t):
-        active_tasks.pop(task_key, None)
-    task.add_done_callback(cleanup)
+    # 2. Queue Delivery (already verified above)
+    queued = delivery_queue.submit(
+        uid, lambda: deliver_file(client, uid, grp_id, file_id, verified=True),
+        weight=await delivery_weight(uid)
+    )
+    if queued is None:
+        await message.reply_text("⏳ **Too many pending files.**\nWait for the current ones to arrive.")
     
     try: await message.delete()
     except: pass
@@ -148,85 +141,185 @@ async def start_file_delivery(client: Client, message):
 # ======================================================
 # 🚚 DELIVERY LOGIC
 # ======================================================
-async def deliver_file(client, uid, grp_id, file_id):
+async def send_file(client, uid, file_id, file, priority):
+    """Sends one file record to a user and registers it in temp.FILES"""
+    # Prepare Caption
+    fname = file.get("file_name", "")
+    fcap = file.get("caption", "")
+    caption = f"{fname}\n\n{fcap}" if fcap and fcap != fname else fname
+    
+    # Buttons
+    btns = []
+    if IS_STREAM:
+        btns.append([InlineKeyboardButton("▶️ Stream / Download", callback_data=f"stream#{file_id}")])
+    btns.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
+    
+    # Send File
+    sent = await governor.call(
+        client.send_cached_media,
+        chat_id=uid,
+        file_id=file_id,
+        caption=caption,
+        protect_content=PROTECT_CONTENT,
+        reply_markup=InlineKeyboardMarkup(btns),
+        priority=priority
+    )
+    temp.FILES[sent.id] = {
+        "owner": uid, 
+        "file": file_id, 
+        "expire": int(time.time()) + PM_FILE_DELETE_TIME
+    }
+    return sent
+
+async def deliver_file(client, uid, grp_id, file_id, verified=False):
     try:
         # Get File
         file = await get_file_details(file_id)
         if not file: return
 
-        # Verify Premium Again (Security)
-        if not await has_premium_or_grace(uid):
+        # Verify Premium (Security) unless the caller just did
+        if not verified and not await is_premium(uid):
             return
 
-        # Prepare Caption
-        fname = file.get("file_name", "")
-        fcap = file.get("caption", "")
-        caption = f"{fname}\n\n{fcap}" if fcap and fcap != fname else fname
-        
-        # Buttons
-        btns = []
-        if IS_STREAM:
-            btns.append([InlineKeyboardButton("▶️ Stream / Download", callback_data=f"stream#{file_id}")])
-        btns.append([InlineKeyboardButton("❌ Close", callback_data="close_data")])
-        
-        # Send File
-        sent = await client.send_cached_media(
-            chat_id=uid,
-            file_id=file_id,
-            caption=caption,
-            protect_content=PROTECT_CONTENT,
-            reply_markup=InlineKeyboardMarkup(btns)
-        )
-        
-        # Schedule Deletion
-        del_task = asyncio.create_task(schedule_deletion(client, sent, uid, file_id))
+        sent = await send_file(client, uid, file_id, file, PRIORITY_HIGH)
         
-        # Track Deletion Task
-        dt_key = f"del_{sent.id}"
-        active_tasks[dt_key] = del_task
-        def cleanup_del(t):
-            active_tasks.pop(dt_key, None)
-        del_task.add_done_callback(cleanup_del)
+        # Schedule Deletion (persistent, survives restarts)
+        await scheduler.schedule(PM_FILE_DELETE_TIME, "file_expire", chat_id=uid, message_id=sent.id, file_id=file_id)
         
     except Exception as e:
         logger.error(f"Delivery Error: {e}")
 
 # ======================================================
-# 🗑 SCHEDULE DELETION & RESEND
+# 🗑 EXPIRE FILES & OFFER RESEND (Scheduler jobs)
 # ======================================================
-async def schedule_deletion(client, msg, uid, file_id):
+async def expire_files(batch):
+    for args in batch:
+        temp.FILES.pop(args["message_id"], None)
+
+    # Delete File(s)
+    await bulk_delete(batch)
+
+    # Send Resend Option, then drop it after RESEND_EXPIRE_TIME
+    for args in batch:
+        try:
+            rs_btn = InlineKeyboardMarkup([[InlineKeyboardButton("🔁 Resend File", callback_data=f"resend#{args['file_id']}")]])
+            resend_msg = await governor.call(
+                temp.BOT.send_message, chat_id=args["chat_id"], text="⌛ **File Expired**",
+                reply_markup=rs_btn, priority=PRIORITY_NORMAL
+            )
+            await schedule_delete(args["chat_id"], resend_msg.id, RESEND_EXPIRE_TIME)
+        except Exception:
+            pass
+
+scheduler.register("file_expire", expire_files)
+
+# ======================================================
+# 📦 SEND ALL (BATCH DELIVERY)
+# ======================================================
+# group=-1: the catch-all handler in callbacks.py would swallow it otherwise
+@Client.on_callback_query(filters.regex(r"^sendall#"), group=-1)
+async def send_all_handler(client, query):
+    _, key = query.data.split("#", 1)
+    data = temp.CALLBACK_DATA.get(key)
+    uid = query.from_user.id
+
+    if not data or "files" not in data:
+        return await query.answer("⌛ Result Expired", show_alert=True)
+    if uid != data["owner"] and uid not in ADMINS:
+        return await query.answer("❌ Not your search!", show_alert=True)
+    if await entitlements.is_banned(uid):
+        return await query.answer(BANNED_TEXT, show_alert=True)
+    if not await is_premium(uid):
+        return await query.answer("🔒 Premium Required\n/plan to buy.", show_alert=True)
+
+    task_key = f"batch_{uid}"
+    if task_key in active_tasks:
+        return await query.answer("⏳ Already sending your files…", show_alert=True)
+
+    await query.answer("📦 Sending files in PM…")
+    task = asyncio.create_task(deliver_batch(client, uid, data["files"]))
+    active_tasks[task_key] = task
+    task.add_done_callback(lambda t: active_tasks.pop(task_key, None))
+
+async def deliver_batch(client, uid, file_ids):
+    """
+    One lookup, one progress message, one deletion job for the whole batch.
+    Each file is a delivery_queue job, so a big batch waits its fair turn
+    and still arrives in list order (episode order).
+    """
+    files = await get_files_details(file_ids)
+    ids = [fid for fid in file_ids if fid in files]
+    if not ids:
+        return
+
     try:
-        # Register in Temp
-        if not hasattr(temp, 'FILES'): temp.FILES = {}
-        temp.FILES[msg.id] = {
-            "owner": uid, 
-            "file": file_id, 
-            "expire": int(time.time()) + PM_FILE_DELETE_TIME
-        }
-        
-        # Wait
-        await asyncio.sleep(PM_FILE_DELETE_TIME)
-        
-        # Remove from Temp
-        if msg.id in temp.FILES:
-            del temp.FILES[msg.id]
-            
-        # Delete File
-        try: await msg.delete()
-        except: pass
-        
-        # Send Resend Option
-        rs_btn = InlineKeyboardMarkup([[InlineKeyboardButton("🔁 Resend File", callback_data=f"resend#{file_id}")]])
-        resend_msg = await client.send_message(uid, "⌛ **File Expired**", reply_markup=rs_btn)
-        
-        # Delete Resend Button
-        await asyncio.sleep(RESEND_EXPIRE_TIME)
-        try: await resend_msg.delete()
-        except: pass
-        
-    except asyncio.CancelledError:
-        # Clean up if cancelled
-        temp.FILES.pop(msg.id, None)
+        progress = await governor.call(
+            client.send_message, chat_id=uid, text=f"📦 **Sending** `0/{len(ids)}`…",
+            priority=PRIORITY_HIGH
+        )
+    except Exception as e:
+        # Usually: user never started the bot in PM
+        logger.warning(f"Batch delivery to {uid} failed: {e}")
+        return
+
+    weight = await delivery_weight(uid)
+    jobs = [
+        delivery_queue.submit(
+            uid, lambda fid=fid: send_file(client, uid, fid, files[fid], PRIORITY_NORMAL),
+            weight=weight
+        )
+        for fid in ids
+    ]
+
+    sent_ids = []
+    for i, job in enumerate(jobs, 1):
+        sent = await job if job else None
+        if sent:
+            sent_ids.append(sent.id)
+
+        if i % BATCH_PROGRESS_EVERY == 0 and i < len(ids):
+            try:
+                await governor.call(progress.edit, f"📦 **Sending** `{i}/{len(ids)}`…", scope=uid, priority=PRIORITY_LOW)
+            except Exception:
+                pass
+
+    try:
+        await governor.call(
+            progress.edit,
+            f"✅ **Sent** `{len(sent_ids)}/{len(ids)}` files\n"
+            f"⏳ Auto-delete in `{get_readable_time(PM_FILE_DELETE_TIME)}`",
+            scope=uid, priority=PRIORITY_LOW
+        )
+    except Exception:
+        pass
+
+    # One scheduled deletion for the whole batch (+ progress message)
+    await scheduler.schedule(
+        PM_FILE_DELETE_TIME, "batch_expire",
+        chat_id=uid, message_ids=sent_ids + [progress.id], count=len(sent_ids)
+    )
+
+async def expire_batches(batch):
+    to_delete = []
+    for args in batch:
+        for mid in args["message_ids"]:
+            temp.FILES.pop(mid, None)
+            to_delete.append({"chat_id": args["chat_id"], "message_id": mid})
+
+    await bulk_delete(to_delete)
+
+    for args in batch:
+        try:
+            notice = await governor.call(
+                temp.BOT.send_message, chat_id=args["chat_id"],
+                text=f"⌛ **{args['count']} Files Expired**\nSearch again to get them back.",
+                priority=PRIORITY_NORMAL
+            )
+            await schedule_delete(args["chat_id"], notice.id, RESEND_EXPIRE_TIME)
+        except Exception:
+            pass
+
+scheduler.register("batch_expire", expire_batches)
 
 # ======================================================
 # 🔁 RESEND HANDLER
@@ -236,7 +329,9 @@ async def resend_handler(client, query):
     file_id = query.data.split("#")[1]
     uid = query.from_user.id
     
-    if not await has_premium_or_grace(uid):
+    if await entitlements.is_banned(uid):
+        return await query.answer(BANNED_TEXT, show_alert=True)
+    if not await is_premium(uid):
         return await query.answer("🔒 Premium Required", show_alert=True)
         
     await query.answer()
@@ -244,5 +339,8 @@ async def resend_handler(client, query):
     except: pass
     
     # Resend
-    asyncio.create_task(deliver_file(client, uid, 0, file_id))
+    delivery_queue.submit(
+        uid, lambda: deliver_file(client, uid, 0, file_id, verified=True),
+        weight=await delivery_weight(uid)
+    )
 
@@ -1,4 +1,3 @@
-import asyncio
 import hashlib
 from math import ceil
 from time import time
@@ -13,7 +12,13 @@ from database.ia_filterdb import get_search_results
 from utils import (
     get_size,
     is_premium,
+    entitlements,
     temp,
+    governor,
+    scheduler,
+    schedule_delete,
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
     learn_keywords,
     suggest_query
 )
@@ -44,16 +49,8 @@ if not hasattr(temp, 'MSG_ACTIVITY'):
 # 🔧 ADMIN CHECK HELPER
 # =====================================================
 async def is_group_admin(client, chat_id, user_id):
-    """Check if user is admin in the group"""
-    try:
-        if user_id in ADMINS: return True
-        member = await client.get_chat_member(chat_id, user_id)
-        return member.status in (
-            enums.ChatMemberStatus.ADMINISTRATOR,
-            enums.ChatMemberStatus.OWNER
-        )
-    except:
-        return False
+    """Check if user is admin in the group (cached)"""
+    return await entitlements.is_chat_admin(client, chat_id, user_id)
 
 
 # =====================================================
@@ -136,6 +133,17 @@ def make_callback_key(search, offset, source_chat_id, owner, is_pm):
     except:
         return "expired"
 
+def make_files_key(file_ids, owner):
+    """Short key for a page of file ids (Send All button)"""
+    raw = f"files_{owner}_{time()}"
+    key = hashlib.md5(raw.encode()).hexdigest()[:10]
+    temp.CALLBACK_DATA[key] = {
+        'files': list(file_ids),
+        'owner': owner,
+        't': time()
+    }
+    return key
+
 def get_callback_data(key):
     return temp.CALLBACK_DATA.get(key)
 
@@ -154,20 +162,24 @@ async def filter_handler(client, message):
         user_id = message.from_user.id
         chat_id = message.chat.id
         is_pm = message.chat.type == enums.ChatType.PRIVATE
+
+        if await entitlements.is_banned(user_id):
+            return # Banned users are ignored silently
         
         # ==============================
         # 🔒 PM: CHECK PREMIUM
         # ==============================
+        # One entitlement check per message (admins short-circuit to True)
+        is_prem = await is_premium(user_id)
+
         if is_pm:
-            if user_id not in ADMINS:
-                is_prem = await is_premium(user_id, client)
-                if not is_prem:
-                    btn = InlineKeyboardMarkup([[InlineKeyboardButton("💎 Buy Premium", callback_data="buy_premium")]])
-                    return await message.reply(
-                        "🔒 **Premium Required**\n\nPM Search is only for Premium users.\nBuy Premium to unlock.",
-                        reply_markup=btn,
-                        quote=True
-                    )
+            if not is_prem:
+                btn = InlineKeyboardMarkup([[InlineKeyboardButton("💎 Buy Premium", callback_data="buy_premium")]])
+                return await message.reply(
+                    "🔒 **Premium Required**\n\nPM Search is only for Premium users.\nBuy Premium to unlock.",
+                    reply_markup=btn,
+                    quote=True
+                )
             source_chat = user_id
         
         # ==============================
@@ -178,10 +190,8 @@ async def filter_handler(client, message):
             if stg.get("search") is False: return # Search disabled
 
             # Rate Limit (Skip for Admins/Premium)
-            if user_id not in ADMINS:
-                is_prem = await is_premium(user_id) # Silent check
-                if not is_prem and is_rate_limited(user_id):
-                    return await message.reply("⚠️ **Slow Down!**\n\nWait 1 minute or buy Premium.", quote=True)
+            if not is_prem and is_rate_limited(user_id):
+                return await message.reply("⚠️ **Slow Down!**\n\nWait 1 minute or buy Premium.", quote=True)
             
             source_chat = chat_id
 
@@ -191,7 +201,7 @@ async def filter_handler(client, message):
         # Sanitize
         search = txt.replace('"', '').replace("'", "").strip()
         
-        await send_results(client, chat_id, user_id, search, 0, source_chat, is_pm)
+        await send_results(client, chat_id, user_id, search, 0, source_chat, is_pm, is_prem=is_prem)
         
     except Exception as e:
         print(f"Filter Error: {e}")
@@ -200,7 +210,7 @@ async def filter_handler(client, message):
 # =====================================================
 # 🔎 SEND RESULTS
 # =====================================================
-async def send_results(client, chat_id, owner, search, offset, source_chat, is_pm, msg=None, retry=False):
+async def send_results(client, chat_id, owner, search, offset, source_chat, is_pm, msg=None, retry=False, is_prem=None):
     try:
         limit = RESULTS_PER_PAGE_PM if is_pm else RESULTS_PER_PAGE_GROUP
         files, next_offset, total = await get_search_results(search, offset=offset, limit=limit)
@@ -209,20 +219,21 @@ async def send_results(client, chat_id, owner, search, offset, source_chat, is_p
         if not files and not retry:
             alt = suggest_query(search)
             if alt:
-                return await send_results(client, chat_id, owner, alt, 0, source_chat, is_pm, msg, True)
+                return await send_results(client, chat_id, owner, alt, 0, source_chat, is_pm, msg, True, is_prem)
 
         if not files:
             txt = f"❌ **No Results Found:** `{search}`"
             if msg: await msg.edit(txt)
             else: 
                 m = await client.send_message(chat_id, txt)
-                asyncio.create_task(auto_delete(m, 10)) # Delete 'No results' fast
+                await schedule_delete(chat_id, m.id, 10) # Delete 'No results' fast
             return
 
         # Formatting
         page = (offset // limit) + 1
         total_pages = ceil(total / limit)
-        is_prem = await is_premium(owner)
+        if is_prem is None:
+            is_prem = await is_premium(owner)
         crown = "💎" if is_prem else "👤"
         
         text = f"{crown} **Search:** `{search}`\n**Found:** `{total}` | **Page:** `{page}/{total_pages}`\n\n"
@@ -248,15 +259,24 @@ async def send_results(client, chat_id, owner, search, offset, source_chat, is_p
             key = make_callback_key(search, offset + limit, source_chat, owner, is_pm)
             btns.append(InlineKeyboardButton("Next ▶️", callback_data=f"pg#{key}"))
 
-        markup = InlineKeyboardMarkup([btns]) if btns else None
+        rows = [btns] if btns else []
+        key = make_files_key([f.get('_id') for f in files], owner)
+        rows.append([InlineKeyboardButton(f"📦 Send All ({len(files)})", callback_data=f"sendall#{key}")])
+        markup = InlineKeyboardMarkup(rows)
 
         if msg:
-            await msg.edit(text, reply_markup=markup, disable_web_page_preview=True)
+            await governor.call(
+                msg.edit, text, reply_markup=markup, disable_web_page_preview=True,
+                scope=chat_id, priority=PRIORITY_HIGH
+            )
             temp.MSG_ACTIVITY[msg.id] = time() # Update activity
         else:
-            m = await client.send_message(chat_id, text, reply_markup=markup, disable_web_page_preview=True)
+            m = await governor.call(
+                client.send_message, chat_id, text, reply_markup=markup, disable_web_page_preview=True,
+                scope=chat_id, priority=PRIORITY_HIGH
+            )
             temp.MSG_ACTIVITY[m.id] = time()
-            asyncio.create_task(auto_expire(m))
+            await scheduler.schedule(RESULT_EXPIRE_TIME, "results_expire", chat_id=chat_id, message_id=m.id)
 
     except Exception as e:
         print(f"Send Results Error: {e}")
@@ -293,32 +313,28 @@ async def pagination(client, query):
 
 
 # =====================================================
-# ⏱ AUTO EXPIRE
+# ⏱ AUTO EXPIRE (Persistent scheduler jobs)
 # =====================================================
-async def auto_expire(msg):
-    try:
-        msg_id = msg.id
-        while True:
-            await asyncio.sleep(RESULT_EXPIRE_TIME)
-            
-            # Check last activity
-            last_act = temp.MSG_ACTIVITY.get(msg_id, 0)
-            if time() - last_act < RESULT_EXPIRE_TIME:
-                continue # Was active recently
-            break
-            
-        await msg.edit("⌛ **Results Expired**", reply_markup=None)
-        await asyncio.sleep(EXPIRE_DELETE_DELAY)
-        await msg.delete()
-        
+async def expire_results(batch):
+    for args in batch:
+        msg_id = args["message_id"]
+
+        # Check last activity (RAM; empty after restart = expired)
+        idle = time() - temp.MSG_ACTIVITY.get(msg_id, 0)
+        if idle < RESULT_EXPIRE_TIME:
+            await scheduler.schedule(RESULT_EXPIRE_TIME - idle, "results_expire", **args)
+            continue
+
+        try:
+            await governor.call(
+                temp.BOT.edit_message_text, args["chat_id"], msg_id, "⌛ **Results Expired**",
+                reply_markup=None, priority=PRIORITY_LOW
+            )
+        except:
+            pass
+
         # Cleanup
         temp.MSG_ACTIVITY.pop(msg_id, None)
-        
-    except:
-        pass
-
-async def auto_delete(msg, delay):
-    await asyncio.sleep(delay)
-    try: await msg.delete()
-    except: pass
+        await schedule_delete(args["chat_id"], msg_id, EXPIRE_DELETE_DELAY)
 
+scheduler.register("results_expire", expire_results)
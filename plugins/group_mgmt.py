@@ -1,10 +1,9 @@
-import asyncio
 from datetime import datetime, timedelta
-from hydrogram import Client, filters, enums
+from hydrogram import Client, filters
 from hydrogram.types import ChatPermissions, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from database.users_chats_db import db
 from info import ADMINS
-from utils import temp
+from utils import temp, schedule_delete, entitlements
 
 # =========================
 # CONFIG
@@ -17,15 +16,8 @@ AUTO_MUTE_TIME = 600  # 10 minutes
 # =========================
 
 async def is_admin(client, chat_id, user_id):
-    try:
-        if user_id in ADMINS: return True
-        member = await client.get_chat_member(chat_id, user_id)
-        return member.status in (
-            enums.ChatMemberStatus.ADMINISTRATOR,
-            enums.ChatMemberStatus.OWNER
-        )
-    except:
-        return False
+    # Cached (positive + negative) via entitlement service
+    return await entitlements.is_chat_admin(client, chat_id, user_id)
 
 # =========================
 # MODERATION (REPLY)
@@ -172,15 +164,10 @@ async def group_filters(client, message):
     dl = data.get("dlink", {})
     for w, delay in dl.items():
         if w in txt:
-            # Schedule Delete
-            asyncio.create_task(delayed_delete(message, delay))
+            # Schedule Delete (persistent)
+            await schedule_delete(chat_id, message.id, delay)
             return
 
-async def delayed_delete(msg, delay):
-    await asyncio.sleep(delay)
-    try: await msg.delete()
-    except: pass
-
 # =========================
 # CACHE CLEAR & BUTTONS
 # =========================
@@ -201,7 +188,7 @@ async def clear_cache_cb(bot, query):
     # Clear RAM
     temp.SETTINGS.clear()
     temp.FILES.clear()
-    temp.PREMIUM.clear()
+    entitlements.clear()
     temp.KEYWORDS.clear()
     
     await query.answer("✅ Cache Cleared!", show_alert=True)
@@ -6,9 +6,21 @@ from hydrogram import Client, filters, enums
 from hydrogram.errors import FloodWait, MessageNotModified
 from hydrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from info import ADMINS, DATA_DATABASE_URL, DATABASE_NAME, INDEX_LOG_CHANNEL
-from database.ia_filterdb import save_file
-from utils import get_readable_time
+from info import ADMINS, DATA_DATABASE_URL, DATABASE_NAME, INDEX_LOG_CHANNEL, INDEX_CHANNELS, RECONCILE_INTERVAL
+from database.ia_filterdb import (
+    save_file,
+    save_files,
+    pack_file_id,
+    load_known_hashes,
+    is_known,
+    update_captions,
+    set_sources,
+    delete_file_ids,
+    get_source_range,
+    get_max_source_id,
+    get_existing_ids
+)
+from utils import get_readable_time, governor, PRIORITY_LOW, temp, INDEX_RATES, schedule_delete
 
 # =====================================================
 # GLOBALS
@@ -16,6 +28,7 @@ from utils import get_readable_time
 LOCK = asyncio.Lock()
 CANCEL = False
 WAITING_SKIP = {} 
+CAPTION_BATCH = 200  # Known duplicates flushed as caption-only bulk updates
 
 # =====================================================
 # RESUME DB
@@ -35,21 +48,36 @@ def set_resume(chat_id, msg_id):
         upsert=True
     )
 
+def advance_resume(chat_id, msg_id):
+    """Moves an existing resume point forward only (never creates one)"""
+    resume_col.update_one(
+        {"_id": chat_id},
+        {"$max": {"last_id": msg_id}}
+    )
+
 # =====================================================
 # HELPERS
 # =====================================================
-async def auto_delete(bot, chat_id, msg_id, delay=120):
-    await asyncio.sleep(delay)
-    try:
-        await bot.delete_messages(chat_id, msg_id)
-    except:
-        pass
+def get_index_media(msg):
+    """Video / document of a channel post with source info attached, else None"""
+    if not msg or msg.empty or msg.media not in (
+        enums.MessageMediaType.VIDEO,
+        enums.MessageMediaType.DOCUMENT
+    ):
+        return None
+    media = getattr(msg, msg.media.value, None)
+    if not media:
+        return None
+    media.caption = msg.caption
+    media.chat_id = msg.chat.id if msg.chat else None
+    media.message_id = msg.id
+    return media
 
 async def send_log(bot, text):
     if not INDEX_LOG_CHANNEL:
         return
     try:
-        await bot.send_message(INDEX_LOG_CHANNEL, text)
+        await governor.call(bot.send_message, chat_id=INDEX_LOG_CHANNEL, text=text, priority=PRIORITY_LOW)
     except:
         pass
 
@@ -184,6 +212,25 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
     # 🔥 FIX 2: स्कैनिंग हमेशा लेटेस्ट मैसेज से शुरू करो
     current_id = last_msg_id - skip
 
+    # ⚡ Files already indexed from this channel skip the insert/dup round trip
+    known = await asyncio.to_thread(load_known_hashes, chat_id)
+    pending_captions = []
+
+    # 📈 Live telemetry for /admin and /metrics
+    INDEX_RATES.reset()
+    temp.INDEX_STATS.update(running=True, start=start_time, scanned=0, saved=0, dup=0, err=0)
+
+    async def timed_write(coro):
+        t0 = time.perf_counter()
+        res = await coro
+        INDEX_RATES.add("db_ms", (time.perf_counter() - t0) * 1000)
+        INDEX_RATES.add("db_writes")
+        return res
+
+    def count_flood(seconds):
+        # Only this run's own FloodWaits (not broadcasts / deliveries)
+        INDEX_RATES.add("flood", seconds)
+
     try:
         # 🔥 FIX 3: लूप तब तक चलाओ जब तक पुराने स्टॉप पॉइंट तक न पहुंच जाओ
         while current_id > stop_id:
@@ -191,9 +238,9 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
                 break
 
             try:
-                msg = await bot.get_messages(chat_id, current_id)
-            except FloodWait as e:
-                await asyncio.sleep(e.value)
+                msg = await governor.call(bot.get_messages, chat_id, current_id, flood_hook=count_flood)
+            except FloodWait:
+                # Governor has already backed off this method
                 continue
             except Exception:
                 # अगर मैसेज डिलीटेड है तो स्किप
@@ -201,6 +248,8 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
                 continue
 
             processed += 1
+            INDEX_RATES.add("fetched")
+            temp.INDEX_STATS.update(scanned=processed, saved=saved, dup=dup, err=err)
 
             # Status update (हर 50 msg पर)
             if processed % 50 == 0:
@@ -241,8 +290,22 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
                 current_id -= 1
                 continue
 
+            packed = pack_file_id(media.file_id)
+            if packed and is_known(known, packed):
+                dup += 1
+                INDEX_RATES.add("dup")
+                pending_captions.append((packed, msg.caption or ""))
+                if len(pending_captions) >= CAPTION_BATCH:
+                    await timed_write(update_captions(pending_captions))
+                    pending_captions = []
+                current_id -= 1
+                continue
+
             media.caption = msg.caption
-            res = await save_file(media)
+            media.chat_id = chat_id
+            media.message_id = msg.id
+            res = await timed_write(save_file(media))
+            INDEX_RATES.add({"suc": "saved", "dup": "dup"}.get(res, "err"))
 
             if res == "suc":
                 saved += 1
@@ -253,6 +316,8 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
 
             # अगला मैसेज चेक करो (Descending Order)
             current_id -= 1
+
+        await update_captions(pending_captions)
         
         # 🔥 FIX 4: जब पूरा हो जाए, तो Resume ID को सबसे हाईएस्ट ID (last_msg_id) पर सेट करो
         # ताकि अगली बार बोट को पता हो कि यहाँ तक स्कैन हो चुका है।
@@ -262,6 +327,8 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
     except Exception as e:
         await status.edit(f"❌ Failed: `{e}`")
         return
+    finally:
+        temp.INDEX_STATS.update(running=False, scanned=processed, saved=saved, dup=dup, err=err)
 
     total_time = get_readable_time(time.time() - start_time)
 
@@ -273,7 +340,7 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
         f"✅ `{saved}` | ♻️ `{dup}` | ❌ `{err}` | 🚫 `{nomedia}`\n"
         f"⏱ `{total_time}`"
     )
-    asyncio.create_task(auto_delete(bot, final_msg.chat.id, final_msg.id, 120))
+    await schedule_delete(final_msg.chat.id, final_msg.id, 120)
 
     # ---- PERMANENT LOG CHANNEL ----
     await send_log(
@@ -288,6 +355,190 @@ async def index_worker(bot, status, chat_id, last_msg_id, skip, channel_title):
         f"⏱ **Time:** `{total_time}`"
     )
 
+# =====================================================
+# STARTUP CATCH-UP (posts missed while offline)
+# =====================================================
+CATCHUP_BATCH = 200        # ids per get_messages call
+CATCHUP_EMPTY_LIMIT = 2    # consecutive empty batches = end of channel
+CATCHUP_CONCURRENCY = 3    # channels in parallel
+CATCHING_UP = set()        # live indexing must not move these resume points
+CATCHUP_FROM = {}          # chat_id -> resume point snapshotted at startup
+
+def begin_catchup():
+    """
+    Called from bot.py before updates start flowing: snapshots every resume
+    point and freezes it, so live posts can't move it past the offline gap
+    before the catch-up task gets to that channel.
+    """
+    CATCHUP_FROM.update({d["_id"]: d["last_id"] for d in resume_col.find()})
+    CATCHING_UP.update(CATCHUP_FROM)
+
+async def catchup_channel(bot, chat, sem):
+    async with sem:
+        try:
+            chat_id = chat if isinstance(chat, int) else (await bot.get_chat(chat)).id
+        except Exception as e:
+            return await send_log(bot, f"⚠️ **Catch-up skipped:** `{chat}` ({e})")
+
+        # Only channels that were fully indexed once have a safe start point
+        last_id = CATCHUP_FROM.pop(chat_id, None)
+        if not last_id:
+            CATCHING_UP.discard(chat_id)
+            return
+
+        saved = dup = err = 0
+        head = last_id
+        next_id = last_id + 1
+        empty_batches = 0
+
+        try:
+            while empty_batches < CATCHUP_EMPTY_LIMIT:
+                ids = list(range(next_id, next_id + CATCHUP_BATCH))
+                next_id += CATCHUP_BATCH
+                try:
+                    msgs = await governor.call(bot.get_messages, chat_id, ids, priority=PRIORITY_LOW)
+                except FloodWait:
+                    next_id -= CATCHUP_BATCH
+                    continue
+
+                msgs = [m for m in msgs if m and not m.empty]
+                if not msgs:
+                    empty_batches += 1
+                    continue
+                empty_batches = 0
+                head = max(head, max(m.id for m in msgs))
+
+                medias = [md for md in map(get_index_media, msgs) if md]
+                for md in medias:
+                    md.chat_id = chat_id
+
+                statuses = await save_files(medias)
+                saved += statuses.count("suc")
+                dup += statuses.count("dup")
+                err += statuses.count("err")
+
+            await asyncio.to_thread(set_resume, chat_id, head)
+        finally:
+            CATCHING_UP.discard(chat_id)
+
+        if head > last_id:
+            await send_log(
+                bot,
+                "🔄 **Startup Catch-up**\n\n"
+                f"🆔 `{chat_id}` | 📨 `{last_id + 1}` → `{head}`\n"
+                f"✅ `{saved}` | ♻️ `{dup}` | ❌ `{err}`"
+            )
+
+async def catchup_index(bot):
+    """Background task started from bot.py; never blocks startup"""
+    await asyncio.sleep(10)  # Let the bot settle and answer users first
+    sem = asyncio.Semaphore(CATCHUP_CONCURRENCY)
+    try:
+        await asyncio.gather(
+            *[catchup_channel(bot, ch, sem) for ch in INDEX_CHANNELS],
+            return_exceptions=True
+        )
+    finally:
+        # Snapshots of channels that aren't live-indexed (or failed to resolve)
+        CATCHING_UP.difference_update(CATCHUP_FROM)
+        CATCHUP_FROM.clear()
+
+# =====================================================
+# PERIODIC RECONCILIATION (channel <-> index drift)
+# =====================================================
+RECONCILE_BATCH = 200
+
+async def reconcile_channel(bot, chat_id, stats):
+    upper = max(
+        await asyncio.to_thread(get_resume, chat_id) or 0,
+        await asyncio.to_thread(get_max_source_id, chat_id)
+    )
+
+    start = 1
+    while start <= upper:
+        end = min(start + RECONCILE_BATCH, upper + 1)
+        try:
+            msgs = await governor.call(bot.get_messages, chat_id, list(range(start, end)), priority=PRIORITY_LOW)
+        except FloodWait:
+            continue  # Governor backed off, retry the same window
+
+        stored = await asyncio.to_thread(get_source_range, chat_id, start, end)
+        stale, captions, missing = [], [], []
+
+        for msg in msgs:
+            if not msg:
+                continue
+            media = get_index_media(msg)
+            packed = pack_file_id(media.file_id) if media else None
+            doc = stored.get(msg.id)
+
+            if doc:
+                if packed != doc["_id"]:
+                    # Post deleted, no longer media, or media replaced
+                    stale.append(doc["_id"])
+                    if packed:
+                        missing.append((packed, media))
+                elif (doc.get("caption") or "") != (msg.caption or ""):
+                    captions.append((packed, msg.caption or ""))
+            elif packed:
+                missing.append((packed, media))
+
+        # Files indexed from another post are duplicates, not drift; legacy
+        # docs without a source get this post recorded instead
+        sources = []
+        if missing:
+            existing = await asyncio.to_thread(get_existing_ids, [p for p, _ in missing])
+            sources = [(p, chat_id, md.message_id) for p, md in missing if p in existing]
+            missing = [md for p, md in missing if p not in existing]
+
+        await delete_file_ids(stale)
+        await update_captions(captions)
+        stats["sourced"] += await set_sources(sources)
+        await save_files(missing)
+
+        stats["checked"] += len(msgs)
+        stats["stale"] += len(stale)
+        stats["caption"] += len(captions)
+        stats["missing"] += len(missing)
+        start = end
+
+async def reconcile_index(bot):
+    """Background task started from bot.py"""
+    if not RECONCILE_INTERVAL:
+        return
+
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL)
+        if LOCK.locked():
+            continue  # Manual indexing owns the channels right now
+
+        stats = {"checked": 0, "missing": 0, "stale": 0, "caption": 0, "sourced": 0}
+        temp.RECONCILE_STATS["running"] = True
+        start_time = time.time()
+
+        for chat in INDEX_CHANNELS:
+            try:
+                chat_id = chat if isinstance(chat, int) else (await bot.get_chat(chat)).id
+                if chat_id in CATCHING_UP:
+                    continue
+                await reconcile_channel(bot, chat_id, stats)
+            except Exception as e:
+                await send_log(bot, f"⚠️ **Reconcile failed:** `{chat}` ({e})")
+
+        temp.RECONCILE_STATS.update(stats, running=False, last_run=time.time())
+
+        if stats["missing"] or stats["stale"] or stats["caption"] or stats["sourced"]:
+            await send_log(
+                bot,
+                "🔍 **Index Reconciled**\n\n"
+                f"📨 Checked: `{stats['checked']}`\n"
+                f"➕ Missing added: `{stats['missing']}`\n"
+                f"🗑 Stale removed: `{stats['stale']}`\n"
+                f"✏️ Captions fixed: `{stats['caption']}`\n"
+                f"🔗 Sources backfilled: `{stats['sourced']}`\n"
+                f"⏱ `{get_readable_time(time.time() - start_time)}`"
+            )
+
 # =====================================================
 # STOP
 # =====================================================
@@ -16,7 +16,7 @@ from info import (
     RECEIPT_SEND_USERNAME
 )
 from database.users_chats_db import db
-from utils import is_premium, get_readable_time
+from utils import is_premium, get_readable_time, entitlements, GRACE_PERIOD
 
 # ======================================================
 # ⚙️ CONFIG
@@ -46,21 +46,22 @@ def get_expiry_datetime(expire):
     return expire
 
 async def get_plan_data(uid):
-    """Get user plan details"""
+    """Get user plan details (same view of the plan as entitlements, grace included)"""
     if uid in ADMINS:
         return None, "admin"
     
-    plan = await db.get_plan(uid)
-    if not plan or not plan.get("premium"):
+    plan, exp_dt = await entitlements.plan(uid)
+    if not plan:
         return None, "none"
     
-    expire = plan.get("expire")
-    exp_dt = get_expiry_datetime(expire)
     now = datetime.utcnow()
     
+    # Expired plans are reset by the expiry task, not here
     if exp_dt <= now:
-        await db.update_plan(uid, {"premium": False, "plan": None, "expire": None})
-        return None, "expired"
+        grace_left = exp_dt + GRACE_PERIOD - now
+        if grace_left.total_seconds() <= 0:
+            return None, "expired"
+        return {"plan": plan, "exp_dt": exp_dt, "grace_left": grace_left}, "grace"
     
     remaining = exp_dt - now
     
@@ -156,6 +157,14 @@ async def myplan_cmd(client, message):
         msg = "❌ Plan Expired" if status == "expired" else "❌ No Active Plan"
         return await message.reply(msg, reply_markup=buy_btn())
     
+    if status == "grace":
+        return await message.reply(
+            f"⚠️ **Plan Expired** on {fmt(data['exp_dt'])}\n\n"
+            f"⏳ Access continues for `{get_readable_time(data['grace_left'].total_seconds())}` (grace period).\n"
+            "Renew now to keep Premium.",
+            reply_markup=buy_btn()
+        )
+    
     text = f"""
 🎉 **Premium Active**
 
@@ -1,12 +1,21 @@
 import logging
 import asyncio
+import heapq
 import time
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
 
+from bson import ObjectId
+from hydrogram import enums
+
 from hydrogram.errors import FloodWait
 
-from info import ADMINS, IS_PREMIUM
+from info import (
+    ADMINS, IS_PREMIUM, TG_RATE_LIMIT, TG_CHAT_RATE, TG_FLOOD_RETRIES,
+    DELIVERY_RATE, DELIVERY_WORKERS, DELIVERY_QUEUE_MAX, BIN_CHANNEL, STREAM_LINK_TTL
+)
 from database.users_chats_db import db
+from database.ia_filterdb import get_existing_ids
 
 # ======================================================
 # 📝 LOGGING SETUP
@@ -26,7 +35,6 @@ class temp(object):
 
     SETTINGS = {}       # chat_id -> settings dict
     FILES = {}          # msg_id -> delivery data
-    PREMIUM = {}        # RAM premium cache (user_id -> dict)
     KEYWORDS = {}       # learned keywords (RAM)
     
     # Cache Locks
@@ -40,87 +48,793 @@ class temp(object):
         "dup": 0,
         "err": 0
     }
+
+    RECONCILE_STATS = {
+        "running": False,
+        "last_run": 0,
+        "checked": 0,
+        "missing": 0,
+        "stale": 0,
+        "caption": 0,
+        "sourced": 0
+    }
     
     # Task Flags
     _cleanup_running = False
     _reminder_running = False
 
 
+# ======================================================
+# 🚦 TELEGRAM RATE GOVERNOR
+# ======================================================
+
+PRIORITY_HIGH = 0     # User facing (search replies, deliveries)
+PRIORITY_NORMAL = 1   # Indexing, admin actions
+PRIORITY_LOW = 2      # Broadcasts, logs, reactions, reminders
+
+AIMD_INCREASE = 0.05  # req/s added per successful call
+AIMD_DECREASE = 0.5   # rate multiplier on FloodWait
+MIN_RATE = 0.2
+MAX_CHAT_BUCKETS = 5000
+
+class TokenBucket:
+    """Refilling token bucket with a FloodWait block window"""
+
+    __slots__ = ("rate", "max_rate", "burst", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.max_rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now) -> float:
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class RateGovernor:
+    """
+    Central pacing for Telegram API calls.
+    - Global + per-method + per-chat token buckets
+    - AIMD: halve method rate on FloodWait, creep back up on success
+    - Priority classes: lower classes wait while higher ones are queued
+    """
+
+    def __init__(self, rate, chat_rate):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self._global = TokenBucket(rate)
+        self._methods = {}
+        self._chats = {}
+        self._waiting = [0, 0, 0]
+        self.flood_seconds = 0
+
+    def _method(self, name):
+        bucket = self._methods.get(name)
+        if not bucket:
+            bucket = self._methods[name] = TokenBucket(self.rate)
+        return bucket
+
+    def _chat(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if not bucket:
+            if len(self._chats) > MAX_CHAT_BUCKETS:
+                self._prune_chats()
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, burst=3)
+        return bucket
+
+    def _prune_chats(self):
+        now = time.monotonic()
+        idle = [k for k, b in self._chats.items() if now - b.updated > 60 and now >= b.blocked_until]
+        for k in idle:
+            del self._chats[k]
+
+    async def acquire(self, method, scope=None, priority=PRIORITY_NORMAL):
+        queued = False
+        try:
+            while True:
+                now = time.monotonic()
+                buckets = [self._global, self._method(method)] + ([self._chat(scope)] if scope is not None else [])
+
+                # FloodWait windows and the caller's own chat bucket only stall
+                # this caller: don't count as queued, or lower classes starve
+                own_wait = max(max(b.blocked_until for b in buckets) - now, 0)
+                if scope is not None:
+                    own_wait = max(own_wait, buckets[-1].wait_time(now))
+                if own_wait > 0:
+                    if queued:
+                        self._waiting[priority] -= 1
+                        queued = False
+                    await asyncio.sleep(min(own_wait, 1.0))
+                    continue
+
+                if not queued:
+                    self._waiting[priority] += 1
+                    queued = True
+
+                # Yield to higher priority classes first
+                if any(self._waiting[:priority]):
+                    await asyncio.sleep(0.05)
+                    continue
+
+                wait = max(b.wait_time(now) for b in buckets)
+                if wait <= 0:
+                    for b in buckets:
+                        b.consume()
+                    return
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            if queued:
+                self._waiting[priority] -= 1
+
+    def on_success(self, method):
+        bucket = self._method(method)
+        if bucket.rate < bucket.max_rate:
+            bucket.rate = min(bucket.max_rate, bucket.rate + AIMD_INCREASE)
+
+    def on_flood(self, method, scope, seconds):
+        self.flood_seconds += seconds
+        bucket = self._method(method)
+        bucket.rate = max(MIN_RATE, bucket.rate * AIMD_DECREASE)
+
+        # Chat scoped calls only block that chat, others keep flowing
+        target = self._chat(scope) if scope is not None else bucket
+        target.blocked_until = max(target.blocked_until, time.monotonic() + seconds)
+        logger.warning(f"FloodWait {seconds}s on {method} (scope={scope}), rate -> {bucket.rate:.2f}/s")
+
+    async def call(self, func, *args, scope=None, priority=PRIORITY_NORMAL, retries=TG_FLOOD_RETRIES,
+                   flood_hook=None, **kwargs):
+        """
+        Run a Telegram API call through the governor.
+        Re-raises FloodWait once retries are exhausted.
+        flood_hook(seconds) is called for each FloodWait this call hits
+        (per-caller accounting; flood_seconds is the process-wide total).
+        """
+        method = getattr(func, "__name__", "call")
+        if scope is None:
+            scope = kwargs.get("chat_id")
+
+        for attempt in range(retries + 1):
+            await self.acquire(method, scope, priority)
+            try:
+                result = await func(*args, **kwargs)
+            except FloodWait as e:
+                self.on_flood(method, scope, e.value)
+                if flood_hook:
+                    flood_hook(e.value)
+                if attempt >= retries:
+                    raise
+                continue
+            self.on_success(method)
+            return result
+
+    def stats(self):
+        return {
+            "methods": {k: round(b.rate, 2) for k, b in self._methods.items()},
+            "chats": len(self._chats),
+            "waiting": list(self._waiting),
+            "flood_seconds": self.flood_seconds
+        }
+
+
+governor = RateGovernor(TG_RATE_LIMIT, TG_CHAT_RATE)
+
+
+# ======================================================
+# 📈 ROLLING TELEMETRY
+# ======================================================
+
+class RollingStats:
+    """Per-second counters over a sliding window (default 1 minute)"""
+
+    def __init__(self, window=60):
+        self.window = window
+        self._buckets = {}  # unix second -> {metric: value}
+
+    def add(self, metric, value=1):
+        sec = int(time.time())
+        bucket = self._buckets.get(sec)
+        if bucket is None:
+            bucket = self._buckets[sec] = {}
+            cutoff = sec - self.window
+            for old in [s for s in self._buckets if s <= cutoff]:
+                del self._buckets[old]
+        bucket[metric] = bucket.get(metric, 0) + value
+
+    def totals(self):
+        cutoff = int(time.time()) - self.window
+        out = {}
+        for sec, bucket in self._buckets.items():
+            if sec > cutoff:
+                for k, v in bucket.items():
+                    out[k] = out.get(k, 0) + v
+        return out
+
+    def reset(self):
+        self._buckets.clear()
+
+
+# Manual indexer (plugins/index.py) publishes here
+INDEX_RATES = RollingStats()
+
+def get_index_metrics():
+    """temp.INDEX_STATS totals + last-minute rates for dashboard / metrics endpoint"""
+    stats = dict(temp.INDEX_STATS)
+    t = INDEX_RATES.totals()
+    window = min(INDEX_RATES.window, max(1, time.time() - stats.get("start", 0)))
+    seen = t.get("saved", 0) + t.get("dup", 0) + t.get("err", 0)
+
+    stats.update({
+        "msgs_per_sec": round(t.get("fetched", 0) / window, 2),
+        "files_per_sec": round(t.get("saved", 0) / window, 2),
+        "dup_ratio": round(t.get("dup", 0) / seen, 3) if seen else 0,
+        "flood_seconds": t.get("flood", 0),
+        "db_latency_ms": round(t.get("db_ms", 0) / t["db_writes"], 1) if t.get("db_writes") else 0
+    })
+    return stats
+
+
+# ======================================================
+# 🎫 FAIR DELIVERY QUEUE
+# ======================================================
+
+class FairQueue:
+    """
+    Weighted-fair dispatch of per-user FIFO jobs.
+    - Every user has a virtual clock advanced by 1/weight per dispatched
+      job; the ready user with the lowest clock goes next
+    - One job in flight per user (keeps a user's files in order)
+    - A shared token bucket caps the global dispatch rate
+    """
+
+    def __init__(self, rate, workers=4, max_per_user=30):
+        self.workers = workers
+        self.max_per_user = max_per_user
+        self._budget = TokenBucket(rate)
+        self._queues = {}       # uid -> deque[(job, future, enqueued_at)]
+        self._weights = {}
+        self._vtime = {}
+        self._clock = 0.0       # Virtual time of the last dispatch
+        self._busy = set()
+        self._ready = asyncio.Event()
+        self._tasks = []
+        self.rates = RollingStats()
+
+    def submit(self, uid, job, weight=1.0):
+        """
+        Queue `job` (a coroutine function) for `uid`.
+        Returns a future with the job's result (None on error),
+        or None if the user's queue is full.
+        """
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        q = self._queues.get(uid)
+        if q is None:
+            q = self._queues[uid] = deque()
+            # New / returning users start at the current clock, no saved-up credit
+            self._vtime[uid] = max(self._vtime.get(uid, 0.0), self._clock)
+        if len(q) >= self.max_per_user:
+            self.rates.add("rejected")
+            return None
+
+        fut = asyncio.get_running_loop().create_future()
+        q.append((job, fut, time.monotonic()))
+        self._weights[uid] = max(weight, 0.1)
+        self._ready.set()
+        return fut
+
+    def _next(self):
+        ready = [uid for uid in self._queues if uid not in self._busy]
+        if not ready:
+            return None
+        uid = min(ready, key=self._vtime.__getitem__)
+        q = self._queues[uid]
+        job, fut, queued_at = q.popleft()
+        if not q:
+            del self._queues[uid]
+
+        self._clock = self._vtime[uid]
+        self._vtime[uid] += 1 / self._weights[uid]
+        self._busy.add(uid)
+        return uid, job, fut, queued_at
+
+    async def _worker(self):
+        while True:
+            if not any(uid not in self._busy for uid in self._queues):
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            wait = self._budget.wait_time(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            item = self._next()
+            if not item:
+                continue
+            self._budget.consume()
+            uid, job, fut, queued_at = item
+            self.rates.add("dispatched")
+            self.rates.add("wait_ms", (time.monotonic() - queued_at) * 1000)
+
+            result = None
+            try:
+                result = await job()
+            except Exception as e:
+                logger.error(f"Delivery job failed for {uid}: {e}")
+            finally:
+                self._busy.discard(uid)
+                if uid not in self._queues:
+                    # Idle users drop out; their clock only matters while queued
+                    self._vtime.pop(uid, None)
+                    self._weights.pop(uid, None)
+                if not fut.done():
+                    fut.set_result(result)
+                self._ready.set()
+
+    def stats(self):
+        t = self.rates.totals()
+        depths = [len(q) for q in self._queues.values()]
+        return {
+            "depth": sum(depths),
+            "users": len(depths),
+            "max_user_depth": max(depths, default=0),
+            "in_flight": len(self._busy),
+            "dispatched_per_min": t.get("dispatched", 0),
+            "rejected_per_min": t.get("rejected", 0),
+            "avg_wait_ms": round(t.get("wait_ms", 0) / t["dispatched"], 1) if t.get("dispatched") else 0
+        }
+
+
+delivery_queue = FairQueue(DELIVERY_RATE, DELIVERY_WORKERS, DELIVERY_QUEUE_MAX)
+
+
+# ======================================================
+# ⏰ PERSISTENT SCHEDULER
+# ======================================================
+
+class Scheduler:
+    """
+    One heap of delayed jobs instead of one sleeping task per message.
+    Jobs are stored in Mongo (db.jobs) and reloaded on restart.
+    Due jobs are processed in batches per action: handler(list_of_args).
+    """
+
+    MAX_SLEEP = 30
+
+    def __init__(self):
+        self._heap = []          # (due, seq, job)
+        self._seq = 0
+        self._handlers = {}
+        self._wakeup = asyncio.Event()
+        self._running = False
+
+    def register(self, action, handler):
+        self._handlers[action] = handler
+
+    def _push(self, job):
+        self._seq += 1
+        heapq.heappush(self._heap, (job["due"], self._seq, job))
+        # Wake the loop if this job is now the earliest one
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    async def schedule(self, delay, action, **args):
+        job = {"_id": ObjectId(), "due": time.time() + delay, "action": action, "args": args}
+        try:
+            await db.add_job(job)
+        except Exception as e:
+            logger.error(f"Scheduler persist error: {e}")
+        self._push(job)
+        return job["_id"]
+
+    async def run(self):
+        if self._running:
+            return
+        self._running = True
+
+        # Reload jobs that survived a restart (handlers may already have
+        # scheduled, and persisted, new ones before this task got to run)
+        try:
+            queued = {job["_id"] for _, _, job in self._heap}
+            async for job in await db.get_jobs():
+                if job["_id"] not in queued:
+                    self._push(job)
+            logger.info(f"✅ Scheduler Started ({len(self._heap)} pending jobs)")
+        except Exception as e:
+            logger.error(f"Scheduler load error: {e}")
+
+        while True:
+            try:
+                timeout = self.MAX_SLEEP
+                if self._heap:
+                    timeout = min(timeout, max(0, self._heap[0][0] - time.time()))
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                # Pop everything due in this tick as one batch
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[2])
+                if due:
+                    await self._run_due(due)
+            except Exception as e:
+                logger.error(f"Scheduler loop error: {e}")
+                await asyncio.sleep(1)
+
+    async def _run_due(self, jobs):
+        by_action = {}
+        for job in jobs:
+            by_action.setdefault(job["action"], []).append(job["args"])
+
+        for action, batch in by_action.items():
+            handler = self._handlers.get(action)
+            if not handler:
+                logger.warning(f"Scheduler: no handler for '{action}', dropping {len(batch)} jobs")
+                continue
+            try:
+                await handler(batch)
+            except Exception as e:
+                logger.error(f"Scheduler '{action}' error: {e}")
+
+        await db.delete_jobs([job["_id"] for job in jobs])
+
+    def pending(self):
+        return len(self._heap)
+
+
+scheduler = Scheduler()
+
+async def schedule_delete(chat_id, message_id, delay):
+    """Persistent replacement for `sleep(delay); delete()` tasks"""
+    await scheduler.schedule(delay, "delete", chat_id=chat_id, message_id=message_id)
+
+async def bulk_delete(batch):
+    """Deletes [{chat_id, message_id}, ...] with one call per chat (max 100 ids each)"""
+    by_chat = {}
+    for args in batch:
+        by_chat.setdefault(args["chat_id"], []).append(args["message_id"])
+
+    for chat_id, ids in by_chat.items():
+        for i in range(0, len(ids), 100):
+            try:
+                await governor.call(temp.BOT.delete_messages, chat_id, ids[i:i + 100], priority=PRIORITY_LOW)
+            except Exception:
+                pass
+
+scheduler.register("delete", bulk_delete)
+
+
+# ======================================================
+# 🔗 STREAM LINKS (BIN_CHANNEL DEDUPE)
+# ======================================================
+
+STREAM_LINK_CACHE = 5000
+STREAM_LINK_TOUCH = 86400   # Persist last_used at most once a day per file / BIN message
+STREAM_GC_BATCH = 500
+
+class StreamLinks:
+    """
+    packed file_id -> BIN_CHANNEL message id.
+    Mongo is the source of truth, an LRU sits in front; a file is
+    forwarded to BIN_CHANNEL once and its links reused afterwards.
+    Streaming a BIN message keeps its link alive as well, so shared or
+    bookmarked URLs aren't collected while people still use them.
+    """
+
+    def __init__(self, maxsize=STREAM_LINK_CACHE):
+        self.maxsize = maxsize
+        self._lru = OrderedDict()   # file_id -> [msg_id, last_used]
+        self._locks = {}            # file_id -> [lock, holders + waiters]
+        self._touched = OrderedDict()   # BIN msg_id -> last persisted use
+        self._listeners = []        # Called with BIN msg_ids of collected links
+        self.created = 0
+        self.reused = 0
+
+    def _remember(self, file_id, msg_id, last_used):
+        entry = self._lru[file_id] = [msg_id, last_used]
+        self._lru.move_to_end(file_id)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+        return entry
+
+    async def get(self, client, file_id):
+        """Returns (msg_id, new_msg); new_msg is set only when just forwarded"""
+        entry = self._lru.get(file_id)
+        if entry is None:
+            # One forward per file even if the button is spammed
+            slot = self._locks.setdefault(file_id, [asyncio.Lock(), 0])
+            slot[1] += 1
+            try:
+                async with slot[0]:
+                    entry = self._lru.get(file_id)
+                    if entry is None:
+                        doc = await db.get_stream_link(file_id)
+                        if doc:
+                            entry = self._remember(file_id, doc["msg_id"], doc.get("last_used", 0))
+                        else:
+                            msg = await governor.call(
+                                client.send_cached_media, chat_id=BIN_CHANNEL, file_id=file_id,
+                                priority=PRIORITY_HIGH
+                            )
+                            await db.save_stream_link(file_id, msg.id)
+                            self._remember(file_id, msg.id, time.time())
+                            self.created += 1
+                            return msg.id, msg
+            finally:
+                # Drop the lock with its last user, never under a waiter
+                slot[1] -= 1
+                if not slot[1]:
+                    self._locks.pop(file_id, None)
+
+        self._lru.move_to_end(file_id)
+        self.reused += 1
+        now = time.time()
+        if now - entry[1] > STREAM_LINK_TOUCH:
+            entry[1] = now
+            await db.touch_stream_link(file_id)
+        return entry[0], None
+
+    async def touch_msg(self, msg_id):
+        now = time.time()
+        if now - self._touched.get(msg_id, 0) <= STREAM_LINK_TOUCH:
+            return
+        self._touched[msg_id] = now
+        self._touched.move_to_end(msg_id)
+        while len(self._touched) > self.maxsize:
+            self._touched.popitem(last=False)
+        try:
+            await db.touch_stream_msg(msg_id)
+        except Exception as e:
+            logger.warning(f"Stream link touch failed: {e}")
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    def forget(self, file_ids, msg_ids=()):
+        for fid in file_ids:
+            self._lru.pop(fid, None)
+        for mid in msg_ids:
+            self._touched.pop(mid, None)
+        if msg_ids:
+            for fn in self._listeners:
+                try:
+                    fn(msg_ids)
+                except Exception as e:
+                    logger.error(f"Listener error: {e}")
+
+    def stats(self):
+        return {"cached": len(self._lru), "created": self.created, "reused": self.reused}
+
+
+stream_links = StreamLinks()
+
+async def collect_stream_links(docs, cutoff):
+    """Drops links unused since `cutoff` or whose file left the index"""
+    indexed = get_existing_ids([d["_id"] for d in docs])
+    stale = [d for d in docs if d.get("last_used", 0) < cutoff or d["_id"] not in indexed]
+    if not stale:
+        return 0
+
+    await bulk_delete([{"chat_id": BIN_CHANNEL, "message_id": d["msg_id"]} for d in stale])
+    ids = [d["_id"] for d in stale]
+    await db.delete_stream_links(ids)
+    stream_links.forget(ids, [d["msg_id"] for d in stale])
+    return len(stale)
+
+async def stream_links_gc():
+    """Background task started from bot.py (daily)"""
+    if not STREAM_LINK_TTL:
+        return
+
+    while True:
+        await asyncio.sleep(86400)
+        try:
+            cutoff = time.time() - STREAM_LINK_TTL
+            removed, batch = 0, []
+            async for doc in await db.get_stream_links():
+                batch.append(doc)
+                if len(batch) >= STREAM_GC_BATCH:
+                    removed += await collect_stream_links(batch, cutoff)
+                    batch = []
+            if batch:
+                removed += await collect_stream_links(batch, cutoff)
+            if removed:
+                logger.info(f"🔗 Stream link GC: removed {removed} BIN copies")
+        except Exception as e:
+            logger.error(f"Stream link GC error: {e}")
+
+
 # ======================================================
 # 👑 PREMIUM CONFIG
 # ======================================================
 
 GRACE_PERIOD = timedelta(minutes=30)
-PREMIUM_CACHE_TTL = 600  # 10 Minutes
+PREMIUM_CACHE_TTL = 600     # 10 Minutes (premium users)
+FREE_CACHE_TTL = 300        # 5 Minutes (negative results)
+BAN_CACHE_TTL = 300
+CHAT_ADMIN_CACHE_TTL = 300
+ENTITLEMENT_CACHE_SIZE = 20000
 
 # ======================================================
-# ⚡ ULTRA FAST PREMIUM CHECK
+# 🎟 ENTITLEMENT SERVICE (Premium / Ban / Admin)
 # ======================================================
 
-async def is_premium(user_id, bot=None) -> bool:
+class TTLCache:
+    """Bounded LRU with per-entry expiry"""
+
+    def __init__(self, ttl, maxsize=ENTITLEMENT_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (value, expires_at)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if not item:
+            return default
+        if item[1] < time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return item[0]
+
+    def set(self, key, value):
+        self._data[key] = (value, time.time() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Entitlements:
     """
-    Checks if a user is premium efficiently.
-    1. Checks Admins
-    2. Checks Global Flag
-    3. Checks RAM Cache
-    4. Checks Database
+    Single place for "may this user do X" checks.
+    Free users and non-banned users are cached too (negative caching),
+    so a normal user costs at most one DB query per TTL window.
+    Plan / ban writes in Database invalidate the user's entries.
     """
-    # 1. Admins are always premium
-    if user_id in ADMINS:
-        return True
-    
-    # 2. If Premium System is Disabled
-    if not IS_PREMIUM:
-        return True
-
-    now_ts = time.time()
-    cached = temp.PREMIUM.get(user_id)
-
-    # 3. Check RAM Cache (Fastest)
-    if cached and (now_ts - cached["checked_at"] < PREMIUM_CACHE_TTL):
-        expire = cached["expire"]
-        if expire:
-            # Check expiry + grace period
-            return datetime.utcnow() <= expire + GRACE_PERIOD
-        return False
-
-    # 4. Check Database (If cache miss)
-    try:
-        plan = await db.get_plan(user_id)
-        
-        # Helper to update cache
-        def update_cache(is_prem, exp_date=None):
-            temp.PREMIUM[user_id] = {
-                "expire": exp_date,
-                "checked_at": now_ts
-            }
-            return is_prem
-
-        if not plan or not plan.get("premium"):
-            return update_cache(False)
-
-        expire = plan.get("expire")
-        
-        # Convert to datetime object
+
+    def __init__(self):
+        self._premium = TTLCache(PREMIUM_CACHE_TTL)   # uid -> (plan, expire datetime)
+        self._free = TTLCache(FREE_CACHE_TTL)         # uid -> True
+        self._bans = TTLCache(BAN_CACHE_TTL)          # uid -> ban status dict
+        self._chat_admins = TTLCache(CHAT_ADMIN_CACHE_TTL)  # (chat, uid) -> bool
+
+    @staticmethod
+    def _in_grace(expire):
+        return datetime.utcnow() <= expire + GRACE_PERIOD
+
+    async def plan(self, user_id):
+        """(plan, expire) while a premium plan is on record (even past its expiry), else (None, None)"""
+        cached = self._premium.get(user_id)
+        if cached:
+            return cached
+        if self._free.get(user_id):
+            return None, None
+
+        try:
+            plan = await db.get_plan(user_id)
+        except Exception as e:
+            logger.error(f"DB Error in plan: {e}")
+            return None, None
+
+        expire = plan.get("expire") if plan and plan.get("premium") else None
         if isinstance(expire, (int, float)):
             expire = datetime.utcfromtimestamp(expire)
-        elif not isinstance(expire, datetime):
-            return update_cache(False)
 
-        # Validate Expiry
-        if datetime.utcnow() > expire + GRACE_PERIOD:
-            # Expired
-            return update_cache(False)
-        
-        # Valid Premium
-        return update_cache(True, expire)
+        if isinstance(expire, datetime):
+            self._premium.set(user_id, (plan, expire))
+            return plan, expire
 
-    except Exception as e:
-        logger.error(f"DB Error in is_premium: {e}")
-        # Fallback to cache if DB fails
-        if cached:
-            return bool(cached["expire"] and datetime.utcnow() <= cached["expire"] + GRACE_PERIOD)
-        return False
+        self._free.set(user_id, True)
+        return None, None
+
+    async def is_premium(self, user_id) -> bool:
+        # Admins are always premium; disabled system = everyone
+        if user_id in ADMINS or not IS_PREMIUM:
+            return True
+        _, expire = await self.plan(user_id)
+        return bool(expire) and self._in_grace(expire)
+
+    async def tier(self, user_id) -> str:
+        """admin / premium / grace / free (everyone is free while IS_PREMIUM is off)"""
+        if user_id in ADMINS:
+            return "admin"
+        if not IS_PREMIUM:
+            return "free"
+        _, expire = await self.plan(user_id)
+        if not expire or not self._in_grace(expire):
+            return "free"
+        return "grace" if datetime.utcnow() > expire else "premium"
+
+    async def ban_status(self, user_id) -> dict:
+        cached = self._bans.get(user_id)
+        if cached is not None:
+            if not cached["status"] or cached.get("until", 0) > time.time():
+                return cached
+        try:
+            status = await db.get_ban_status(user_id)
+        except Exception as e:
+            logger.error(f"DB Error in ban_status: {e}")
+            return {"status": False}
+        self._bans.set(user_id, status)
+        return status
+
+    async def is_banned(self, user_id) -> bool:
+        if user_id in ADMINS:
+            return False
+        return (await self.ban_status(user_id))["status"]
+
+    async def is_chat_admin(self, client, chat_id, user_id) -> bool:
+        if user_id in ADMINS:
+            return True
+        key = (chat_id, user_id)
+        cached = self._chat_admins.get(key)
+        if cached is not None:
+            return cached
+        try:
+            member = await client.get_chat_member(chat_id, user_id)
+            ok = member.status in (
+                enums.ChatMemberStatus.ADMINISTRATOR,
+                enums.ChatMemberStatus.OWNER
+            )
+        except Exception:
+            return False
+        self._chat_admins.set(key, ok)
+        return ok
+
+    def invalidate(self, user_id):
+        self._premium.pop(user_id)
+        self._free.pop(user_id)
+        self._bans.pop(user_id)
+
+    def clear(self):
+        for c in (self._premium, self._free, self._bans, self._chat_admins):
+            c.clear()
+
+    def stats(self):
+        return {
+            "premium": len(self._premium),
+            "free": len(self._free),
+            "bans": len(self._bans),
+            "chat_admins": len(self._chat_admins)
+        }
+
+
+entitlements = Entitlements()
+db.add_listener(entitlements.invalidate)
+
+async def is_premium(user_id, bot=None) -> bool:
+    """Premium (or grace) check via the entitlement service"""
+    return await entitlements.is_premium(user_id)
 
 
 # ======================================================
@@ -218,11 +932,13 @@ async def premium_expiry_reminder(bot):
                         # If time matches (within a window)
                         if expire - delta <= now < expire:
                             try:
-                                await bot.send_message(
-                                    uid,
-                                    "⏰ **Premium Expiry Alert**\n\n"
+                                await governor.call(
+                                    bot.send_message,
+                                    chat_id=uid,
+                                    text="⏰ **Premium Expiry Alert**\n\n"
                                     f"Your premium expires in **{tag}**.\n"
-                                    "Use /plan to renew!"
+                                    "Use /plan to renew!",
+                                    priority=PRIORITY_LOW
                                 )
                                 # Update DB
                                 await db.update_plan(uid, {**plan, "last_reminder": tag})
@@ -299,11 +1015,6 @@ async def cleanup_files_memory():
             for k in keys_to_del:
                 temp.FILES.pop(k, None)
             
-            # Clean Premium Cache
-            if len(temp.PREMIUM) > 2000:
-                temp.PREMIUM.clear() # Full clear is safer/faster than partial
-                logger.info("Cleared Premium Cache")
-                
         except Exception as e:
             logger.error(f"Cleanup Error: {e}")
 
@@ -313,14 +1024,14 @@ async def cleanup_files_memory():
 
 async def broadcast_messages(user_id, message, pin=False):
     try:
-        msg = await message.copy(chat_id=user_id)
+        msg = await governor.call(message.copy, chat_id=user_id, priority=PRIORITY_LOW)
         if pin:
             try: await msg.pin(both_sides=True)
             except: pass
         return "Success"
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await broadcast_messages(user_id, message, pin)
+    except FloodWait:
+        # Governor already retried; keep the user, just skip this round
+        return "Flood"
     except Exception:
         # If user blocked bot, delete from DB to save future resources
         try: await db.delete_user(int(user_id))
@@ -329,14 +1040,13 @@ async def broadcast_messages(user_id, message, pin=False):
 
 async def groups_broadcast_messages(chat_id, message, pin=False):
     try:
-        msg = await message.copy(chat_id=chat_id)
+        msg = await governor.call(message.copy, chat_id=chat_id, priority=PRIORITY_LOW)
         if pin:
             try: await msg.pin()
             except: pass
         return "Success"
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await groups_broadcast_messages(chat_id, message, pin)
+    except FloodWait:
+        return "Flood"
     except Exception:
         return "Error"
 
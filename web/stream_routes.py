@@ -1,15 +1,25 @@
-import math
+import asyncio
+import logging
 import secrets
-import mimetypes
 
 from aiohttp import web
-from info import BIN_CHANNEL
-from utils import temp
-from web.utils.custom_dl import TGCustomYield, chunk_size, offset_fix
+from utils import temp, governor, delivery_queue, stream_links, get_index_metrics
+from web.utils.custom_dl import get_stream_meta, stream_range, STREAM_META, FANOUT_STATS
+from web.utils.client_pool import client_pool
+from web.utils.media_sessions import session_manager
+from web.utils.stream_tuner import stream_tuner
+from web.utils.stream_limits import stream_limiter, stream_rate, client_ip
+from web.utils.http_range import parse_range, make_etag, etag_matches, RangeNotSatisfiable
+from web.utils.chunk_cache import chunk_cache
 from web.utils.render_template import media_watch
 
+logger = logging.getLogger(__name__)
+
 routes = web.RouteTableDef()
 
+# /download response accounting
+STREAM_STATS = {"active": 0, "completed": 0, "aborted": 0, "failed": 0, "bytes": 0}
+
 
 # ======================================================
 # 🌐 ROOT + SEARCH PAGE (UPTIME SAFE)
@@ -98,6 +108,27 @@ async def root_route_handler(request):
     return web.Response(text=html, content_type="text/html")
 
 
+# ======================================================
+# 📈 METRICS (Indexer + rate governor, last minute)
+# ======================================================
+@routes.get("/metrics")
+async def metrics_handler(request):
+    return web.json_response({
+        "index": get_index_metrics(),
+        "governor": governor.stats(),
+        "delivery": delivery_queue.stats(),
+        "stream_cache": chunk_cache.stats(),
+        "stream_fanout": FANOUT_STATS,
+        "stream_meta": len(STREAM_META),
+        "stream_links": stream_links.stats(),
+        "stream_clients": client_pool.stats(),
+        "media_sessions": session_manager.stats(),
+        "stream_tuner": stream_tuner.stats(),
+        "stream_limits": stream_limiter.stats(),
+        "stream_responses": STREAM_STATS
+    })
+
+
 # ======================================================
 # ▶️ WATCH PAGE
 # ======================================================
@@ -106,7 +137,7 @@ async def watch_handler(request):
     try:
         message_id = int(request.match_info["message_id"])
         return web.Response(
-            text=await media_watch(message_id),
+            text=await media_watch(message_id, request.query.get("t", "")),
             content_type="text/html"
         )
     except Exception:
@@ -132,55 +163,152 @@ async def download_handler(request):
 
 
 # ======================================================
-# 📦 MEDIA STREAM
+# 📦 MEDIA STREAM (RANGE ENGINE)
 # ======================================================
+def multipart_body(message_id, meta, ranges, boundary):
+    """multipart/byteranges: (head bytes, (start, end)) per part + closing line"""
+    size = meta.file_size
+    parts = [
+        (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {meta.mime_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        for start, end in ranges
+    ]
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    length = sum(len(p) for p in parts) + sum(e - s + 1 for s, e in ranges) + len(tail)
+
+    async def body():
+        for head, (start, end) in zip(parts, ranges):
+            yield head
+            async for chunk in stream_range(message_id, meta.dc_id, start, end):
+                yield chunk
+        yield tail
+
+    return body(), length
+
+
 async def media_download(request, message_id: int):
-    range_header = request.headers.get("Range", None)
+    # Admission first: a rejected client costs no Telegram call (HEAD is free)
+    ip = None
+    if request.method != "HEAD":
+        ip = client_ip(request)
+        rejected = stream_limiter.admit(ip)
+        if rejected:
+            code, retry_after = rejected
+            return web.Response(
+                status=code,
+                text="Too many streams" if code == 429 else "Server busy",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    shaped = None
+    try:
+        result = await build_download(request, message_id)
+        if isinstance(result, web.Response):
+            return result
+
+        status, headers, body, length = result
+        # HEAD / empty file: headers only, no upstream I/O
+        if ip is None or not length:
+            return web.Response(status=status, headers=headers)
+
+        # From here the body owns the slot and frees it when it ends
+        shaped = stream_limiter.shape(body, ip, await stream_rate(request.query.get("t", "")))
+    finally:
+        # 404 / 304 / 416 / empty / error: not streaming, the slot goes back now
+        if ip is not None and shaped is None:
+            stream_limiter.release(ip)
 
-    media_msg = await temp.BOT.get_messages(BIN_CHANNEL, message_id)
-    media = getattr(media_msg, media_msg.media.value, None)
-    file_size = media.file_size
+    return await write_body(request, status, headers, shaped, length)
 
-    if range_header:
-        from_bytes, until_bytes = range_header.replace("bytes=", "").split("-")
-        from_bytes = int(from_bytes)
-        until_bytes = int(until_bytes) if until_bytes else file_size - 1
+
+async def build_download(request, message_id: int):
+    """(status, headers, lazy body, length), or a finished Response (404 / 304 / 416)"""
+    meta = await get_stream_meta(message_id)
+    if not meta:
+        return web.Response(status=404, text="File not found")
+    await stream_links.touch_msg(message_id)
+
+    file_size = meta.file_size
+    etag = make_etag(meta.file_id.media_id, file_size)
+    headers = {
+        "Content-Type": meta.mime_type,
+        "Content-Disposition": f'attachment; filename="{meta.file_name}"',
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "public, max-age=86400",
+    }
+
+    # Conditional GET: the bytes behind a message id never change
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return web.Response(status=304, headers={"ETag": etag, "Accept-Ranges": "bytes"})
+
+    # If-Range with a stale / non-matching validator -> full body
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+
+    try:
+        ranges = parse_range(range_header, file_size)
+    except RangeNotSatisfiable:
+        return web.Response(status=416, headers={"Content-Range": f"bytes */{file_size}", "ETag": etag})
+
+    # Bodies are lazy generators: nothing is fetched until iterated
+    if not ranges:
+        status, length = 200, file_size
+        body = stream_range(message_id, meta.dc_id, 0, file_size - 1) if file_size else b""
+    elif len(ranges) == 1:
+        status, (start, end) = 206, ranges[0]
+        length = end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        body = stream_range(message_id, meta.dc_id, start, end)
     else:
-        from_bytes = request.http_range.start or 0
-        until_bytes = request.http_range.stop or file_size - 1
-
-    req_length = until_bytes - from_bytes
-
-    new_chunk_size = await chunk_size(req_length)
-    offset = await offset_fix(from_bytes, new_chunk_size)
-    first_part_cut = from_bytes - offset
-    last_part_cut = (until_bytes % new_chunk_size) + 1
-    part_count = math.ceil(req_length / new_chunk_size)
-
-    body = TGCustomYield().yield_file(
-        media_msg,
-        offset,
-        first_part_cut,
-        last_part_cut,
-        part_count,
-        new_chunk_size
-    )
-
-    file_name = media.file_name or f"{secrets.token_hex(2)}.bin"
-    mime_type = media.mime_type or mimetypes.guess_type(file_name)[0] or "application/octet-stream"
-
-    resp = web.Response(
-        status=206 if range_header else 200,
-        body=body,
-        headers={
-            "Content-Type": mime_type,
-            "Content-Range": f"bytes {from_bytes}-{until_bytes}/{file_size}",
-            "Content-Disposition": f'attachment; filename="{file_name}"',
-            "Accept-Ranges": "bytes",
-        }
-    )
-
-    if resp.status == 200:
-        resp.headers["Content-Length"] = str(file_size)
+        status = 206
+        boundary = secrets.token_hex(12)
+        headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+        body, length = multipart_body(message_id, meta, ranges, boundary)
+
+    headers["Content-Length"] = str(length)
+    return status, headers, body, length
+
+
+async def write_body(request, status, headers, body, length):
+    """
+    Streams `body` with explicit backpressure: the next part is only pulled
+    once write() has drained the previous one to the socket. On disconnect
+    the body is closed at once, cancelling in-flight upstream fetches.
+    """
+    resp = web.StreamResponse(status=status, headers=headers)
+    await resp.prepare(request)
+
+    STREAM_STATS["active"] += 1
+    sent = 0
+    parts = body.__aiter__()
+    try:
+        async for chunk in parts:
+            await resp.write(chunk)
+            sent += len(chunk)
+        await resp.write_eof()
+        STREAM_STATS["completed"] += 1
+    except ConnectionResetError:
+        # Client closed the socket / aborted a seek
+        STREAM_STATS["aborted"] += 1
+        resp.force_close()
+    except asyncio.CancelledError:
+        STREAM_STATS["aborted"] += 1
+        raise
+    except Exception as e:
+        # Headers are out already: truncate and drop the connection
+        STREAM_STATS["failed"] += 1
+        logger.warning(f"Stream {request.path} failed after {sent}/{length} bytes: {e}")
+        resp.force_close()
+    finally:
+        await parts.aclose()
+        STREAM_STATS["active"] -= 1
+        STREAM_STATS["bytes"] += sent
 
     return resp
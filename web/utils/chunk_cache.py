@@ -0,0 +1,138 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+
+from info import STREAM_CACHE_DIR, STREAM_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+# ======================================================
+# 💽 DISK CHUNK CACHE (LRU)
+# ======================================================
+
+class ChunkCache:
+    """
+    PART_SIZE blocks on local disk, keyed by (media_id, chunk_size, offset).
+    - One file per part, written atomically (tmp + rename)
+    - LRU eviction under a byte quota (0 = disabled)
+    - Index is rebuilt from disk (oldest mtime first) on startup
+    """
+
+    def __init__(self, path, quota):
+        self.path = path
+        self.quota = quota
+        self.enabled = quota > 0
+        self._index = OrderedDict()  # filename -> size (LRU order)
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_bytes = 0
+
+        if self.enabled:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _load(self):
+        entries = []
+        for name in os.listdir(self.path):
+            full = os.path.join(self.path, name)
+            if name.endswith(".tmp"):
+                os.remove(full)
+                continue
+            st = os.stat(full)
+            entries.append((st.st_mtime, name, st.st_size))
+
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self.used += size
+        self._evict()
+        logger.info(f"Chunk cache: {len(self._index)} parts, {self.used // (1024 * 1024)} MB")
+
+    @staticmethod
+    def _name(media_id, chunk_size, offset):
+        return f"{media_id}_{chunk_size}_{offset}"
+
+    # --------------------------------------------------
+    # 📥 READ / WRITE
+    # --------------------------------------------------
+    def _read(self, name):
+        with open(os.path.join(self.path, name), "rb") as f:
+            return f.read()
+
+    def _write(self, name, data):
+        full = os.path.join(self.path, name)
+        tmp = f"{full}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, full)
+
+    async def get(self, media_id, chunk_size, offset):
+        if not self.enabled:
+            return None
+
+        name = self._name(media_id, chunk_size, offset)
+        if name not in self._index:
+            self.misses += 1
+            return None
+
+        try:
+            data = await asyncio.to_thread(self._read, name)
+        except OSError:
+            self._drop(name)
+            self.misses += 1
+            return None
+
+        self._index.move_to_end(name)
+        self.hits += 1
+        self.hit_bytes += len(data)
+        return data
+
+    async def put(self, media_id, chunk_size, offset, data):
+        if not self.enabled or not data or len(data) > self.quota:
+            return
+
+        name = self._name(media_id, chunk_size, offset)
+        if name in self._index:
+            return
+
+        try:
+            await asyncio.to_thread(self._write, name, data)
+        except OSError as e:
+            logger.warning(f"Chunk cache write failed: {e}")
+            return
+
+        self._index[name] = len(data)
+        self.used += len(data)
+        self._evict()
+
+    # --------------------------------------------------
+    # 🧹 EVICTION
+    # --------------------------------------------------
+    def _drop(self, name):
+        self.used -= self._index.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.path, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.used > self.quota and self._index:
+            self._drop(next(iter(self._index)))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "parts": len(self._index),
+            "used_mb": round(self.used / (1024 * 1024), 1),
+            "quota_mb": round(self.quota / (1024 * 1024), 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0,
+            "hit_mb": round(self.hit_bytes / (1024 * 1024), 1)
+        }
+
+
+chunk_cache = ChunkCache(STREAM_CACHE_DIR, STREAM_CACHE_SIZE)
@@ -0,0 +1,106 @@
+import time
+import logging
+
+from hydrogram import Client
+
+from info import API_ID, API_HASH, MULTI_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+# ======================================================
+# 🤹 STREAM CLIENT POOL (MAIN + HELPER BOTS)
+# ======================================================
+
+class PoolClient:
+    __slots__ = ("index", "client", "load", "served", "floods", "blocked_until")
+
+    def __init__(self, index, client):
+        self.index = index
+        self.client = client
+        self.load = 0              # Active streams
+        self.served = 0            # Bytes streamed
+        self.floods = 0
+        self.blocked_until = 0.0
+
+
+class ClientPool:
+    """
+    Main bot + helper bots (MULTI_TOKENS) for streaming.
+    - pick(): least-loaded client, preferring one that already has a
+      media session for the file's DC; FloodWaited clients are skipped
+      while any other client is free
+    - Helpers must be members of BIN_CHANNEL (they read messages there)
+    """
+
+    def __init__(self):
+        self.clients = []
+
+    async def start(self, main: Client):
+        self.clients = [PoolClient(0, main)]
+
+        for i, token in enumerate(MULTI_TOKENS, 1):
+            helper = Client(
+                name=f"helper_{i}",
+                api_id=API_ID,
+                api_hash=API_HASH,
+                bot_token=token,
+                in_memory=True,
+                no_updates=True
+            )
+            try:
+                await helper.start()
+            except Exception as e:
+                logger.error(f"Helper bot #{i} failed to start: {e}")
+                continue
+            self.clients.append(PoolClient(i, helper))
+
+        if len(self.clients) > 1:
+            logger.info(f"🤹 Stream pool: {len(self.clients)} clients")
+
+    async def stop(self):
+        for pc in self.clients[1:]:
+            try:
+                await pc.client.stop()
+            except Exception:
+                pass
+
+    def __len__(self):
+        return len(self.clients)
+
+    def pick(self, dc_id, exclude=()):
+        now = time.monotonic()
+        candidates = [pc for pc in self.clients if pc.index not in exclude]
+        ready = [pc for pc in candidates if pc.blocked_until <= now]
+        if ready:
+            candidates = ready
+        if not candidates:
+            return None
+
+        # A missing media session (auth export + handshake) costs about one extra stream
+        return min(
+            candidates,
+            key=lambda pc: (pc.load + (dc_id not in pc.client.media_sessions), pc.blocked_until, pc.index)
+        )
+
+    def on_flood(self, pc, seconds):
+        pc.floods += 1
+        pc.blocked_until = max(pc.blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Stream client #{pc.index} FloodWait {seconds}s, failing over")
+
+    def stats(self):
+        now = time.monotonic()
+        return [
+            {
+                "client": pc.index,
+                "load": pc.load,
+                "served_mb": round(pc.served / (1024 * 1024), 1),
+                "floods": pc.floods,
+                "blocked": max(0, round(pc.blocked_until - now)),
+                "dcs": sorted(pc.client.media_sessions)
+            }
+            for pc in self.clients
+        ]
+
+
+client_pool = ClientPool()
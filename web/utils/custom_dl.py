@@ -1,13 +1,23 @@
 import math
+import time
+import asyncio
+import secrets
+import mimetypes
+from collections import deque, OrderedDict
 from typing import Union
 
 from hydrogram.types import Message
 from hydrogram import Client, utils, raw
-from hydrogram.session import Session, Auth
-from hydrogram.errors import AuthBytesInvalid
+from hydrogram.session import Session
+from hydrogram.errors import FloodWait
 from hydrogram.file_id import FileId, FileType, ThumbnailSource
 
-from utils import temp
+from info import BIN_CHANNEL, STREAM_PREFETCH, STREAM_SHARED_CHUNKS, STREAM_META_CACHE
+from utils import temp, stream_links
+from web.utils.chunk_cache import chunk_cache
+from web.utils.client_pool import client_pool
+from web.utils.media_sessions import session_manager
+from web.utils.stream_tuner import stream_tuner, PART_SIZE
 
 
 # ======================================================
@@ -37,6 +47,97 @@ async def offset_fix(offset: int, chunksize: int) -> int:
     return offset - (offset % chunksize)
 
 
+# ======================================================
+# 🗂 STREAM METADATA CACHE (BIN_CHANNEL)
+# ======================================================
+# Players send many range requests per session; decode each BIN message
+# once instead of calling get_messages on every seek.
+
+class StreamMeta:
+    __slots__ = ("file_id", "file_size", "mime_type", "file_name", "dc_id")
+
+    def __init__(self, media):
+        self.file_id = FileId.decode(media.file_id)
+        self.file_size = media.file_size
+        self.file_name = getattr(media, "file_name", None) or f"{secrets.token_hex(2)}.bin"
+        self.mime_type = (
+            getattr(media, "mime_type", None)
+            or mimetypes.guess_type(self.file_name)[0]
+            or "application/octet-stream"
+        )
+        self.dc_id = self.file_id.dc_id
+
+
+# (pool client index, BIN message_id) -> StreamMeta
+# FileIds carry per-bot access hashes, so every pool client decodes its own copy
+STREAM_META = OrderedDict()
+
+
+def cache_stream_meta(msg: Message, index: int = 0):
+    """Decode + remember a BIN_CHANNEL message. Returns None if it has no media."""
+    media = getattr(msg, msg.media.value, None) if msg and msg.media else None
+    if not media:
+        return None
+
+    key = (index, msg.id)
+    meta = STREAM_META[key] = StreamMeta(media)
+    STREAM_META.move_to_end(key)
+    while len(STREAM_META) > STREAM_META_CACHE:
+        STREAM_META.popitem(last=False)
+    return meta
+
+
+def forget_stream_meta(msg_ids):
+    """BIN messages deleted by the stream link GC"""
+    msg_ids = set(msg_ids)
+    for key in [k for k in STREAM_META if k[1] in msg_ids]:
+        del STREAM_META[key]
+
+
+stream_links.add_listener(forget_stream_meta)
+
+
+async def get_stream_meta(message_id: int, pc=None):
+    index = pc.index if pc else 0
+    meta = STREAM_META.get((index, message_id))
+    if meta:
+        STREAM_META.move_to_end((index, message_id))
+        return meta
+
+    client = pc.client if pc else temp.BOT
+    msg = await client.get_messages(BIN_CHANNEL, message_id)
+    return cache_stream_meta(msg, index)
+
+
+# ======================================================
+# 🔀 SHARED UPSTREAM FETCH (FAN-OUT)
+# ======================================================
+# Concurrent viewers of the same part await one GetFile; recent parts stay
+# in a small ring so viewers a few seconds apart don't refetch either.
+# Parts are always PART_SIZE blocks, so every viewer maps onto the same keys.
+# A fetch is cancelled once its last subscriber has gone.
+
+SHARED_PARTS = OrderedDict()   # (media_id, block offset) -> bytes
+INFLIGHT = {}                  # (media_id, block offset) -> [asyncio.Task, subscribers]
+FANOUT_STATS = {"upstream": 0, "shared": 0, "ring": 0}
+
+
+def remember_part(key, chunk: bytes):
+    SHARED_PARTS[key] = chunk
+    SHARED_PARTS.move_to_end(key)
+    while len(SHARED_PARTS) > STREAM_SHARED_CHUNKS:
+        SHARED_PARTS.popitem(last=False)
+
+
+def forget_inflight(key, task):
+    entry = INFLIGHT.get(key)
+    if entry and entry[0] is task:
+        del INFLIGHT[key]
+    # Nobody may be left to await it (all viewers gone)
+    if not task.cancelled():
+        task.exception()
+
+
 # ======================================================
 # 📡 TELEGRAM CUSTOM STREAMER
 # ======================================================
@@ -46,8 +147,8 @@ class TGCustomYield:
     Custom Telegram file streamer with DC support.
     """
 
-    def __init__(self):
-        self.main_bot = temp.BOT
+    def __init__(self, client: Client = None):
+        self.main_bot = client or temp.BOT
 
     # --------------------------------------------------
     # 📄 FILE PROPERTIES
@@ -60,62 +161,8 @@ class TGCustomYield:
     # --------------------------------------------------
     # 🌍 MEDIA SESSION (DC HANDLING)
     # --------------------------------------------------
-    async def generate_media_session(self, client: Client, msg: Message) -> Session:
-        data = await self.generate_file_properties(msg)
-
-        media_session = client.media_sessions.get(data.dc_id)
-
-        if media_session:
-            return media_session
-
-        # ---- DIFFERENT DC ----
-        if data.dc_id != await client.storage.dc_id():
-            media_session = Session(
-                client,
-                data.dc_id,
-                await Auth(
-                    client,
-                    data.dc_id,
-                    await client.storage.test_mode()
-                ).create(),
-                await client.storage.test_mode(),
-                is_media=True
-            )
-            await media_session.start()
-
-            for _ in range(3):
-                exported_auth = await client.invoke(
-                    raw.functions.auth.ExportAuthorization(
-                        dc_id=data.dc_id
-                    )
-                )
-                try:
-                    await media_session.send(
-                        raw.functions.auth.ImportAuthorization(
-                            id=exported_auth.id,
-                            bytes=exported_auth.bytes
-                        )
-                    )
-                    break
-                except AuthBytesInvalid:
-                    continue
-            else:
-                await media_session.stop()
-                raise AuthBytesInvalid
-
-        # ---- SAME DC ----
-        else:
-            media_session = Session(
-                client,
-                data.dc_id,
-                await client.storage.auth_key(),
-                await client.storage.test_mode(),
-                is_media=True
-            )
-            await media_session.start()
-
-        client.media_sessions[data.dc_id] = media_session
-        return media_session
+    async def generate_media_session(self, client: Client, data: FileId) -> Session:
+        return await session_manager.get(client, data.dc_id)
 
     # --------------------------------------------------
     # 📍 FILE LOCATION
@@ -161,60 +208,142 @@ class TGCustomYield:
         )
 
     # --------------------------------------------------
-    # 🎬 STREAM FILE (RANGE SUPPORT)
+    # 📦 SINGLE PART
     # --------------------------------------------------
-    async def yield_file(
-        self,
-        media_msg: Message,
-        offset: int,
-        first_part_cut: int,
-        last_part_cut: int,
-        part_count: int,
-        chunk_size: int
-    ):
-        client = self.main_bot
-        data = await self.generate_file_properties(media_msg)
-        media_session = await self.generate_media_session(client, media_msg)
-        location = await self.get_location(data)
-
-        current_part = 1
-
+    @staticmethod
+    async def get_part(media_session: Session, location, offset: int, limit: int) -> bytes:
+        started = time.monotonic()
         r = await media_session.send(
             raw.functions.upload.GetFile(
                 location=location,
                 offset=offset,
-                limit=chunk_size
+                limit=limit
             )
         )
 
+        session_manager.record(media_session.dc_id, (time.monotonic() - started) * 1000)
+
         if not isinstance(r, raw.types.upload.File):
-            return
+            return b""
 
-        while current_part <= part_count:
-            chunk = r.bytes
-            if not chunk:
-                break
+        return r.bytes
 
-            offset += chunk_size
+    async def get_cached_part(self, media_id: int, media_session: Session, location, offset: int) -> bytes:
+        """The PART_SIZE block at `offset` (a multiple of PART_SIZE)"""
+        key = (media_id, offset)
 
-            if part_count == 1:
-                yield chunk[first_part_cut:last_part_cut]
-                break
+        chunk = SHARED_PARTS.get(key)
+        if chunk is not None:
+            SHARED_PARTS.move_to_end(key)
+            FANOUT_STATS["ring"] += 1
+            return chunk
 
-            if current_part == 1:
-                yield chunk[first_part_cut:]
-            else:
-                yield chunk
+        entry = INFLIGHT.get(key)
+        if entry:
+            FANOUT_STATS["shared"] += 1
+        else:
+            task = asyncio.create_task(self.fetch_shared_part(key, media_session, location))
+            entry = INFLIGHT[key] = [task, 0]
+            task.add_done_callback(lambda t: forget_inflight(key, t))
+
+        # Shield: one viewer leaving must not cancel the fetch for the others,
+        # but the last one leaving stops the GetFile
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                task.cancel()
+                if INFLIGHT.get(key) is entry:
+                    del INFLIGHT[key]
+
+    async def fetch_shared_part(self, key, media_session: Session, location) -> bytes:
+        media_id, offset = key
+
+        chunk = await chunk_cache.get(media_id, PART_SIZE, offset)
+        if chunk is None:
+            FANOUT_STATS["upstream"] += 1
+            started = time.monotonic()
+            chunk = await self.get_part(media_session, location, offset, PART_SIZE)
+            stream_tuner.on_fetch(media_session.dc_id, len(chunk), time.monotonic() - started)
+            await chunk_cache.put(media_id, PART_SIZE, offset, chunk)
+
+        if chunk:
+            remember_part(key, chunk)
+        return chunk
 
-            r = await media_session.send(
-                raw.functions.upload.GetFile(
-                    location=location,
-                    offset=offset,
-                    limit=chunk_size
-                )
-            )
+    # --------------------------------------------------
+    # 🎬 STREAM FILE (RANGE SUPPORT)
+    # --------------------------------------------------
+    async def yield_file(
+        self,
+        data: FileId,
+        offset: int,
+        first_part_cut: int,
+        last_part_cut: int,
+        part_count: int,
+        chunk_size: int
+    ):
+        """Legacy part-based signature, mapped onto yield_range"""
+        start = offset + first_part_cut
+        end = offset + (part_count - 1) * chunk_size + last_part_cut - 1
+        async for chunk in self.yield_range(data, start, end):
+            yield chunk
+
+    # --------------------------------------------------
+    # 📐 BYTE RANGE (INCLUSIVE)
+    # --------------------------------------------------
+    async def yield_range(self, data: FileId, start: int, end: int):
+        """
+        Pipelined fetch of bytes start..end (inclusive) in PART_SIZE blocks,
+        sliced locally. Parts are yielded in order; in-flight depth follows
+        stream_tuner (starting from STREAM_PREFETCH). Memory is bounded
+        to depth x PART_SIZE.
+        """
+        client = self.main_bot
+        media_session = await self.generate_media_session(client, data)
+        location = await self.get_location(data)
+
+        state = stream_tuner.open(data.dc_id, STREAM_PREFETCH)
+        next_offset = start - start % PART_SIZE
+        pending = deque()   # (task, part offset)
+
+        def fill():
+            nonlocal next_offset
+            while len(pending) < state.depth and next_offset <= end:
+                pending.append((
+                    asyncio.create_task(
+                        self.get_cached_part(data.media_id, media_session, location, next_offset)
+                    ),
+                    next_offset
+                ))
+                next_offset += PART_SIZE
+
+        try:
+            fill()
+            while pending:
+                task, part_offset = pending.popleft()
+                waited = not task.done()
+                chunk = await task
+                stream_tuner.on_part(state, len(chunk), waited)
+
+                # Keep the pipe full before handing the chunk to the client
+                fill()
+
+                if not chunk:
+                    break
 
-            current_part += 1
+                yield chunk[max(0, start - part_offset):end - part_offset + 1]
+        finally:
+            # Client went away / error: drop whatever is still in flight
+            stream_tuner.close(state)
+            tasks = [t for t, _ in pending]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
 
     # --------------------------------------------------
     # 📥 FULL DOWNLOAD (BYTES)
@@ -222,7 +351,7 @@ class TGCustomYield:
     async def download_as_bytesio(self, media_msg: Message):
         client = self.main_bot
         data = await self.generate_file_properties(media_msg)
-        media_session = await self.generate_media_session(client, media_msg)
+        media_session = await self.generate_media_session(client, data)
         location = await self.get_location(data)
 
         limit = 1024 * 1024
@@ -245,3 +374,44 @@ class TGCustomYield:
             offset += limit
 
         return result
+
+
+# ======================================================
+# 🤹 POOLED STREAM (FAILOVER)
+# ======================================================
+
+async def stream_range(message_id: int, dc_id: int, start: int, end: int):
+    """
+    Streams bytes start..end of a BIN message on the least-loaded pool client.
+    On FloodWait (or a helper that can't read BIN_CHANNEL) the rest of the
+    range continues on the next client.
+    """
+    tried = set()
+    while start <= end:
+        pc = client_pool.pick(dc_id, exclude=tried)
+        if not pc:
+            raise RuntimeError("No stream client available")
+
+        pc.load += 1
+        sent = 0
+        try:
+            meta = await get_stream_meta(message_id, pc)
+            async for chunk in TGCustomYield(pc.client).yield_range(meta.file_id, start, end):
+                sent += len(chunk)
+                pc.served += len(chunk)
+                yield chunk
+            return
+        except FloodWait as e:
+            client_pool.on_flood(pc, e.value)
+        except Exception:
+            # Main bot errors are real errors; helpers may just lack access
+            if pc.index == 0 or sent:
+                raise
+        finally:
+            pc.load -= 1
+
+        start += sent
+        tried.add(pc.index)
+        if len(tried) >= len(client_pool):
+            raise RuntimeError("All stream clients are rate limited")
+
@@ -0,0 +1,78 @@
+from typing import List, Optional, Tuple
+
+# ======================================================
+# 📐 HTTP RANGE HELPERS (RFC 9110)
+# ======================================================
+
+MAX_RANGES = 16   # More than this and the Range header is ignored (200 full)
+
+
+class RangeNotSatisfiable(Exception):
+    """No requested range overlaps the file (-> 416)"""
+
+
+def make_etag(media_id: int, size: int) -> str:
+    """Strong validator: a BIN message always points at the same bytes"""
+    return f'"{media_id:x}-{size:x}"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match style list comparison (`*` or comma separated tags)"""
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parses a `Range` header into sorted, merged inclusive (start, end) pairs.
+    - None: no/invalid/unsupported header -> serve the full file
+    - raises RangeNotSatisfiable when every range lies past the end
+    Handles `a-b`, open `a-` and suffix `-n` specs, plus multi-range lists.
+    """
+    if not header:
+        return None
+
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                # Suffix: last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                if last and int(last) < start:
+                    return None
+                end = min(int(last), size - 1) if last else size - 1
+        except ValueError:
+            return None
+
+        if start < 0 or start >= size:
+            continue
+        ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Coalesce overlapping / adjacent ranges
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,159 @@
+import time
+import asyncio
+import logging
+
+from hydrogram import Client, raw
+from hydrogram.session import Session, Auth
+from hydrogram.errors import AuthBytesInvalid
+
+from info import STREAM_WARM_DCS, SESSION_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PING_TIMEOUT = 10
+LATENCY_ALPHA = 0.2   # EMA weight of the newest sample
+
+
+# ======================================================
+# 🌍 MEDIA SESSION MANAGER (PER CLIENT / DC)
+# ======================================================
+
+class MediaSessionManager:
+    """
+    Owns `client.media_sessions` for every stream client.
+    - One creation per (client, DC) even under concurrent viewers
+    - Pre-warms STREAM_WARM_DCS at startup (no auth round trip on first view)
+    - Pings sessions every SESSION_CHECK_INTERVAL, rebuilds dead ones
+    - Keeps a per-DC latency EMA (pings + GetFile calls)
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self.latency = {}      # dc_id -> ms (EMA)
+        self.failures = {}     # dc_id -> failed health checks
+        self.reconnects = {}   # dc_id -> rebuilt sessions
+
+    def record(self, dc_id, ms):
+        old = self.latency.get(dc_id)
+        self.latency[dc_id] = ms if old is None else old + LATENCY_ALPHA * (ms - old)
+
+    # --------------------------------------------------
+    # 🔑 CREATE / GET
+    # --------------------------------------------------
+    async def get(self, client: Client, dc_id: int) -> Session:
+        session = client.media_sessions.get(dc_id)
+        if session:
+            return session
+
+        lock = self._locks.setdefault((id(client), dc_id), asyncio.Lock())
+        async with lock:
+            session = client.media_sessions.get(dc_id)
+            if not session:
+                started = time.monotonic()
+                session = await self._create(client, dc_id)
+                client.media_sessions[dc_id] = session
+                logger.info(f"Media session DC{dc_id} ready in {(time.monotonic() - started) * 1000:.0f} ms")
+        return session
+
+    @staticmethod
+    async def _create(client: Client, dc_id: int) -> Session:
+        test_mode = await client.storage.test_mode()
+
+        # ---- SAME DC ----
+        if dc_id == await client.storage.dc_id():
+            session = Session(client, dc_id, await client.storage.auth_key(), test_mode, is_media=True)
+            await session.start()
+            return session
+
+        # ---- DIFFERENT DC ----
+        session = Session(
+            client,
+            dc_id,
+            await Auth(client, dc_id, test_mode).create(),
+            test_mode,
+            is_media=True
+        )
+        await session.start()
+
+        for _ in range(3):
+            exported_auth = await client.invoke(
+                raw.functions.auth.ExportAuthorization(dc_id=dc_id)
+            )
+            try:
+                await session.send(
+                    raw.functions.auth.ImportAuthorization(
+                        id=exported_auth.id,
+                        bytes=exported_auth.bytes
+                    )
+                )
+                return session
+            except AuthBytesInvalid:
+                continue
+
+        await session.stop()
+        raise AuthBytesInvalid
+
+    async def drop(self, client: Client, dc_id: int):
+        session = client.media_sessions.pop(dc_id, None)
+        if session:
+            try:
+                await session.stop()
+            except Exception:
+                pass
+
+    # --------------------------------------------------
+    # 🩺 HEALTH
+    # --------------------------------------------------
+    async def ping(self, session: Session, dc_id: int) -> bool:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                session.send(raw.functions.Ping(ping_id=int(started * 1000))),
+                PING_TIMEOUT
+            )
+        except Exception:
+            return False
+        self.record(dc_id, (time.monotonic() - started) * 1000)
+        return True
+
+    async def check(self, client: Client, dc_id: int):
+        session = client.media_sessions.get(dc_id)
+        if session and await self.ping(session, dc_id):
+            return
+
+        if session:
+            self.failures[dc_id] = self.failures.get(dc_id, 0) + 1
+            logger.warning(f"Media session DC{dc_id} unhealthy, reconnecting")
+            await self.drop(client, dc_id)
+            self.reconnects[dc_id] = self.reconnects.get(dc_id, 0) + 1
+
+        try:
+            await self.get(client, dc_id)
+        except Exception as e:
+            logger.warning(f"Media session DC{dc_id} unavailable: {e}")
+
+    async def run(self, pool):
+        """Background task started from bot.py: warm up, then health-check"""
+        for pc in pool.clients:
+            for dc_id in STREAM_WARM_DCS:
+                await self.check(pc.client, dc_id)
+
+        while SESSION_CHECK_INTERVAL:
+            await asyncio.sleep(SESSION_CHECK_INTERVAL)
+            for pc in pool.clients:
+                for dc_id in set(STREAM_WARM_DCS) | set(pc.client.media_sessions):
+                    await self.check(pc.client, dc_id)
+
+    def stats(self):
+        dcs = set(self.latency) | set(self.failures)
+        return {
+            dc: {
+                "latency_ms": round(self.latency.get(dc, 0), 1),
+                "failures": self.failures.get(dc, 0),
+                "reconnects": self.reconnects.get(dc, 0)
+            }
+            for dc in sorted(dcs)
+        }
+
+
+session_manager = MediaSessionManager()
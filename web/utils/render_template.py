@@ -1,5 +1,5 @@
-from info import BIN_CHANNEL, URL
-from utils import temp
+from info import URL
+from web.utils.custom_dl import get_stream_meta
 import urllib.parse, html
 
 # ======================================================
@@ -148,16 +148,17 @@ new Plyr('.player', {{
 # 🎬 WATCH HANDLER
 # ======================================================
 
-async def media_watch(message_id: int):
-    msg = await temp.BOT.get_messages(BIN_CHANNEL, message_id)
-    media = getattr(msg, msg.media.value, None)
+async def media_watch(message_id: int, token: str = ""):
+    meta = await get_stream_meta(message_id)
 
-    if not media:
+    if not meta:
         return "<h3>File not found</h3>"
 
     src = urllib.parse.urljoin(URL, f"download/{message_id}")
-    title = html.escape(f"Watch - {media.file_name}")
-    name = html.escape(media.file_name)
+    if token:
+        src += "?t=" + urllib.parse.quote(token)
+    title = html.escape(f"Watch - {meta.file_name}")
+    name = html.escape(meta.file_name)
 
     return WATCH_HTML.format(
         title=title,
@@ -0,0 +1,176 @@
+import hmac
+import time
+import asyncio
+import hashlib
+
+from info import (
+    ADMINS, BOT_TOKEN, TRUST_PROXY,
+    STREAM_MAX_PER_IP, STREAM_MAX_TOTAL, STREAM_RATE, STREAM_PREMIUM_RATE
+)
+from utils import is_premium
+
+BURST_SECONDS = 2          # Bucket depth, in seconds of the tier rate
+IP_RETRY_AFTER = 5
+BUSY_RETRY_AFTER = 10
+MAX_IDLE_BUCKETS = 5000
+
+_KEY = hashlib.sha256(f"stream:{BOT_TOKEN}".encode()).digest()
+
+
+# ======================================================
+# 🎟 STREAM TIER TOKENS
+# ======================================================
+# Watch / download links carry `?t=<uid>.<sig>` so a request can be mapped
+# back to the user who generated it (premium / admin bandwidth tiers).
+
+def sign_stream_user(user_id: int) -> str:
+    sig = hmac.new(_KEY, str(user_id).encode(), hashlib.sha256).hexdigest()[:16]
+    return f"{user_id}.{sig}"
+
+
+def verify_stream_user(token: str):
+    """Returns the user id for a valid token, else None"""
+    uid, _, sig = (token or "").partition(".")
+    if not uid.isdigit() or not sig:
+        return None
+    return int(uid) if hmac.compare_digest(sign_stream_user(int(uid)), token) else None
+
+
+async def stream_rate(token: str) -> int:
+    """Bytes/sec for the link's owner tier (0 = unshaped)"""
+    uid = verify_stream_user(token)
+    if uid in ADMINS:
+        return 0
+    if uid and await is_premium(uid):
+        return STREAM_PREMIUM_RATE
+    return STREAM_RATE
+
+
+def client_ip(request) -> str:
+    # Only the right-most hop was added by our own proxy; anything left of
+    # it is whatever the client chose to send
+    if TRUST_PROXY:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[-1].strip() or request.remote or "unknown"
+    return request.remote or "unknown"
+
+
+# ======================================================
+# 🚰 ADMISSION + SHAPING
+# ======================================================
+
+class ByteBucket:
+    """Token bucket in bytes; callers may overdraw and then sleep it off"""
+
+    __slots__ = ("rate", "tokens", "updated")
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate * BURST_SECONDS
+        self.updated = time.monotonic()
+
+    async def take(self, n: int):
+        now = time.monotonic()
+        self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= n
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class StreamLimiter:
+    """
+    - STREAM_MAX_PER_IP concurrent bodies per client IP (429 past it)
+    - STREAM_MAX_TOTAL concurrent bodies overall (503 past it)
+    - One byte bucket per IP, shared by that IP's streams, at the tier rate
+    Rejections are immediate (with Retry-After), never queued.
+    """
+
+    def __init__(self):
+        self.active = {}     # ip -> open streams
+        self.total = 0
+        self._buckets = {}
+        self.rejected_ip = 0
+        self.rejected_busy = 0
+
+    def admit(self, ip):
+        """Returns None if admitted, else (status, retry_after)"""
+        if STREAM_MAX_TOTAL and self.total >= STREAM_MAX_TOTAL:
+            self.rejected_busy += 1
+            return 503, BUSY_RETRY_AFTER
+        if STREAM_MAX_PER_IP and self.active.get(ip, 0) >= STREAM_MAX_PER_IP:
+            self.rejected_ip += 1
+            return 429, IP_RETRY_AFTER
+
+        self.active[ip] = self.active.get(ip, 0) + 1
+        self.total += 1
+        return None
+
+    def release(self, ip):
+        self.total -= 1
+        left = self.active.get(ip, 1) - 1
+        if left > 0:
+            self.active[ip] = left
+        else:
+            self.active.pop(ip, None)
+
+    def _bucket(self, ip, rate):
+        bucket = self._buckets.get(ip)
+        if not bucket:
+            if len(self._buckets) > MAX_IDLE_BUCKETS:
+                self._buckets = {k: b for k, b in self._buckets.items() if k in self.active}
+            bucket = self._buckets[ip] = ByteBucket(rate)
+        bucket.rate = rate
+        return bucket
+
+    def shape(self, body, ip, rate):
+        """Wraps an admitted body: paces it to `rate` and frees the slot when done"""
+        return ShapedBody(self, body, ip, self._bucket(ip, rate) if rate else None)
+
+    def stats(self):
+        return {
+            "active": self.total,
+            "ips": len(self.active),
+            "max_per_ip": max(self.active.values(), default=0),
+            "rejected_ip": self.rejected_ip,
+            "rejected_busy": self.rejected_busy
+        }
+
+
+class ShapedBody:
+    """
+    Async iterable response body holding one admission slot.
+    The slot is freed when iteration ends, or when the body is dropped
+    unread (client gone before the response started).
+    """
+
+    def __init__(self, limiter, body, ip, bucket):
+        self.limiter = limiter
+        self.body = body
+        self.ip = ip
+        self.bucket = bucket
+        self._open = True
+
+    def release(self):
+        if self._open:
+            self._open = False
+            self.limiter.release(self.ip)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        try:
+            async for chunk in self.body:
+                if self.bucket:
+                    await self.bucket.take(len(chunk))
+                yield chunk
+        finally:
+            self.release()
+
+    def __del__(self):
+        self.release()
+
+
+stream_limiter = StreamLimiter()
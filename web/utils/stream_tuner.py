@@ -0,0 +1,143 @@
+import time
+import itertools
+
+# ======================================================
+# 🎛 ADAPTIVE STREAM TUNING (READ-AHEAD DEPTH)
+# ======================================================
+# Upstream parts are fixed PART_SIZE blocks (GetFile: limit is a power of two
+# up to 1 MB and offset a multiple of it), so the shared ring, in-flight
+# fan-out and disk cache see one key per block whatever a stream's state.
+# Only the number of blocks in flight adapts.
+
+PART_SIZE = 1024 * 1024
+MIN_DEPTH = 1
+MAX_DEPTH = 16
+PROBE_PARTS = 8                # Parts per depth hill-climb step
+EMA_ALPHA = 0.2
+
+
+def ema(old, new):
+    return new if old is None else old + EMA_ALPHA * (new - old)
+
+
+class DCProfile:
+    __slots__ = ("rtt", "bps", "depth")
+
+    def __init__(self):
+        self.rtt = None     # Seconds per upstream GetFile
+        self.bps = None     # Bytes / sec of a single upstream request
+        self.depth = None   # Depth recent streams settled on
+
+
+class StreamState:
+    """One running stream: current depth and what it measured"""
+
+    __slots__ = (
+        "id", "dc_id", "depth", "started", "bytes", "parts",
+        "last_rate", "step_bytes", "step_start", "step_waits"
+    )
+
+    def __init__(self, sid, dc_id, depth):
+        self.id = sid
+        self.dc_id = dc_id
+        self.depth = depth
+        self.started = self.step_start = time.monotonic()
+        self.bytes = self.step_bytes = 0
+        self.parts = 0
+        self.step_waits = 0
+        self.last_rate = None
+
+
+class StreamTuner:
+    """
+    - Per-DC profiles from upstream fetches only (GetFile latency and
+      single-request throughput, timed inside the fetch, so a slow client
+      draining the stream never shows up as a slow DC)
+    - Each stream adapts its in-flight depth: it grows only while the
+      consumer keeps waiting on parts that haven't landed (upstream-bound)
+      and shrinks once read-ahead stays ahead of it (client / shaper-bound),
+      starting from where recent streams on the same DC settled
+    Part size is deliberately fixed at PART_SIZE (1 MB): a per-stream chunk
+    size would split the shared ring, fan-out and disk cache by size, and
+    1 MB is both Telegram's maximum and the cheapest per byte.
+    """
+
+    def __init__(self):
+        self.profiles = {}
+        self.streams = {}
+        self._ids = itertools.count(1)
+
+    def open(self, dc_id: int, depth: int) -> StreamState:
+        profile = self.profiles.get(dc_id)
+        if profile and profile.depth:
+            depth = round(profile.depth)
+
+        state = StreamState(next(self._ids), dc_id, max(MIN_DEPTH, min(MAX_DEPTH, depth)))
+        self.streams[state.id] = state
+        return state
+
+    def close(self, state: StreamState):
+        self.streams.pop(state.id, None)
+        if state.parts >= PROBE_PARTS:
+            profile = self.profiles.setdefault(state.dc_id, DCProfile())
+            profile.depth = ema(profile.depth, state.depth)
+
+    def on_fetch(self, dc_id: int, size: int, seconds: float):
+        """One upstream GetFile finished (ring / cache hits are not reported)"""
+        if size and seconds > 0:
+            profile = self.profiles.setdefault(dc_id, DCProfile())
+            profile.rtt = ema(profile.rtt, seconds)
+            profile.bps = ema(profile.bps, size / seconds)
+
+    def on_part(self, state: StreamState, size: int, waited: bool):
+        """`waited`: the part was still in flight when the consumer wanted it"""
+        state.parts += 1
+        state.bytes += size
+        state.step_bytes += size
+        state.step_waits += waited
+
+        if state.parts % PROBE_PARTS:
+            return
+
+        now = time.monotonic()
+        rate = state.step_bytes / max(now - state.step_start, 1e-3)
+        if not state.step_waits:
+            # Read-ahead already outruns the consumer: extra depth only buffers
+            step = -1
+        elif state.last_rate is None or rate >= state.last_rate * 0.95:
+            # Starved and the last step didn't hurt: fetch further ahead
+            step = 1
+        else:
+            # Grew and got slower (DC pushing back): back off
+            step = -1
+        state.depth = max(MIN_DEPTH, min(MAX_DEPTH, state.depth + step))
+        state.last_rate = rate
+        state.step_bytes = 0
+        state.step_waits = 0
+        state.step_start = now
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "part_kb": PART_SIZE // 1024,
+            "dcs": {
+                dc: {
+                    "part_ms": round((p.rtt or 0) * 1000, 1),
+                    "request_mbps": round((p.bps or 0) * 8 / 1e6, 2),
+                    "depth": round(p.depth or 0, 1)
+                }
+                for dc, p in self.profiles.items()
+            },
+            "streams": [
+                {
+                    "dc": s.dc_id,
+                    "depth": s.depth,
+                    "parts": s.parts,
+                    "mbps": round(s.bytes * 8 / 1e6 / max(now - s.started, 1e-3), 2)
+                }
+                for s in self.streams.values()
+            ]
+        }
+
+
+stream_tuner = StreamTuner()